@@ -20,6 +20,9 @@ setuptools.setup(
     url="https://github.com/hellohaptik/spello",
     packages=setuptools.find_packages(),
     install_requires=require_packages,
+    extras_require={
+        "fast": ["numba>=0.45", "rapidfuzz>=2.0", "marisa-trie>=0.7"],
+    },
     include_package_data=True,
     classifiers=[
         "Programming Language :: Python :: 3.6",
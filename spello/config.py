@@ -1,4 +1,8 @@
-SYMSPELL_ALLOWED_DISTANCES_MAP = {
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
+
+# read only, so that defaults shared by every config can not be changed in place through one of them
+SYMSPELL_ALLOWED_DISTANCES_MAP = MappingProxyType({
     3: 1,
     4: 1,
     5: 1,
@@ -12,9 +16,9 @@ SYMSPELL_ALLOWED_DISTANCES_MAP = {
     13: 3,
     14: 3,
     15: 3
-}
+})
 
-PHONEME_ALLOWED_DISTANCES_MAP = {
+PHONEME_ALLOWED_DISTANCES_MAP = MappingProxyType({
     3: 1,
     4: 2,
     5: 2,
@@ -28,19 +32,45 @@ PHONEME_ALLOWED_DISTANCES_MAP = {
     13: 4,
     14: 4,
     15: 4
-}
+})
 
 
 # TODO: can be written better with dataclasses
 class Config(object):
+    __slots__ = (
+        'max_length_for_spellcorrection',
+        'min_length_for_spellcorrection',
+        'allow_1_extra_edit_for_char_end',
+        'allow_1_extra_edit_for_char_start',
+        'symspell_allowed_distance_map',
+        'phoneme_allowed_distance_map',
+        'symspell_verbosity',
+    )
+
     def __init__(self):
         self.max_length_for_spellcorrection: int = 15
         self.min_length_for_spellcorrection: int = 3
         self.allow_1_extra_edit_for_char_end: bool = True
         self.allow_1_extra_edit_for_char_start: bool = True
-        self.symspell_allowed_distance_map = SYMSPELL_ALLOWED_DISTANCES_MAP.copy()
-        self.phoneme_allowed_distance_map = PHONEME_ALLOWED_DISTANCES_MAP.copy()
+        # default distance maps are read only and shared with the module level defaults. To customize, assign a
+        # new dict, updating defaults in place raises TypeError
+        self.symspell_allowed_distance_map: Mapping[int, int] = SYMSPELL_ALLOWED_DISTANCES_MAP
+        self.phoneme_allowed_distance_map: Mapping[int, int] = PHONEME_ALLOWED_DISTANCES_MAP
         # 0: top suggestion
         # 1: all suggestions of smallest edit distance
         # 2: all suggestions <= max_edit_distance (slower, no early termination)
         self.symspell_verbosity: int = 1
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self.__slots__}
+        # read only default maps can not be pickled, they are pickled as plain dicts
+        for name, value in state.items():
+            if isinstance(value, MappingProxyType):
+                state[name] = dict(value)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # configs pickled before `__slots__` was added carry their attributes as a plain `__dict__`
+        self.__init__()
+        for name, value in state.items():
+            setattr(self, name, value)
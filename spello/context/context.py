@@ -1,16 +1,17 @@
-import re
-from collections import defaultdict
-from itertools import combinations
-from typing import Dict, List, Tuple, NamedTuple, Union
+import warnings
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
-from spello.utils import get_ngrams
-
-MAX_COUNT_ALLOWED = 100
+import numpy as np
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
-class MemoryItem(NamedTuple):
-    score: float
-    decoded: Tuple[int, ...]
+MAX_COUNT_ALLOWED = 100
+UNKNOWN_TOKEN_ID = -1
+PAIR_ID_SHIFT = 32
+PAIR_PROB_DTYPE = np.float32
 
 
 def get_context_pairs(tokens):
@@ -19,37 +20,110 @@ def get_context_pairs(tokens):
     Args:
         tokens (list): list of tokens
     Returns:
-        (list): list of pairs with their distances in token list
+        (set): set of pairs with their distances in token list
     Examples:
-        >>> tokens
-        >>> get_context_pairs(["please", "book", "a", "flight", "for", "me", "to", " pune"])
-        {((' pune', 'for'), 3),
-         ((' pune', 'me'), 2),
-         ((' pune', 'to'), 1),
+        >>> get_context_pairs(["please", "book", "a", "flight", "for", "me", "to", "pune"])
+        {(('please', 'book'), 1),
+         (('please', 'flight'), 3),
          (('book', 'flight'), 2),
          (('book', 'for'), 3),
-         (('book', 'please'), 1),
          (('flight', 'for'), 1),
          (('flight', 'me'), 2),
-         (('flight', 'please'), 3),
          (('flight', 'to'), 3),
          (('for', 'me'), 1),
          (('for', 'to'), 2),
-         (('me', 'to'), 1)}
+         (('for', 'pune'), 3),
+         (('me', 'to'), 1),
+         (('me', 'pune'), 2),
+         (('to', 'pune'), 1)}
     """
     data = set()
-    ngrams = get_ngrams(tokens, 4)
-    if not ngrams:
-        ngrams = [tokens]
-    for ngrams_batch in ngrams:
-        for pair in combinations(ngrams_batch, 2):
-            diff_index = abs(tokens.index(pair[0]) - abs(tokens.index(pair[1])))
-            if len(pair[0]) < 2 or len(pair[1]) < 2:
+    data_add = data.add
+    tokens_count = len(tokens)
+    for i, token_1 in enumerate(tokens):
+        if len(token_1) < 2:
+            continue
+        for j in range(i + 1, min(i + 4, tokens_count)):
+            token_2 = tokens[j]
+            if len(token_2) < 2:
                 continue
-            data.add((pair, diff_index))
+            data_add(((token_1, token_2), j - i))
     return data
 
 
+def update_context_pairs(tokens, model_dict_count, max_count=MAX_COUNT_ALLOWED):
+    """
+    Add counts of context pairs of given list of tokens to model_dict_count in place, counting every pair once per
+    distinct distance it occurs at in the tokens (same pairs as `get_context_pairs`) and capping counts at max_count
+    Args:
+        tokens (list): list of tokens
+        model_dict_count (dict): dict of context pairs and their counts, missing pairs are counted from 0
+        max_count (int): max count allowed for a pair
+    Returns:
+        None
+    """
+    seen = set()
+    seen_add = seen.add
+    tokens_count = len(tokens)
+    for i, token_1 in enumerate(tokens):
+        if len(token_1) < 2:
+            continue
+        for j in range(i + 1, min(i + 4, tokens_count)):
+            token_2 = tokens[j]
+            if len(token_2) < 2:
+                continue
+            key = (token_1, token_2, j - i)
+            if key in seen:
+                continue
+            seen_add(key)
+            pair = (token_1, token_2)
+            count = model_dict_count.get(pair, 0)
+            if count < max_count:
+                model_dict_count[pair] = count + 1
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _get_pair_prob(id_1, id_2, pair_keys, pair_probs, default_prob):
+        if id_1 < 0 or id_2 < 0:
+            return default_prob
+        key = (np.uint64(id_1) << np.uint64(PAIR_ID_SHIFT)) | np.uint64(id_2)
+        index = np.searchsorted(pair_keys, key)
+        if index < pair_keys.shape[0] and pair_keys[index] == key:
+            return pair_probs[index]
+        return default_prob
+
+    @njit(cache=True)
+    def _viterbi_step(prev_scores, ids_2, ids_1, ids, pair_keys, pair_probs, default_prob):
+        pair_probs_2_1 = np.empty((ids_2.shape[0], ids_1.shape[0]))
+        for k in range(ids_2.shape[0]):
+            for j in range(ids_1.shape[0]):
+                pair_probs_2_1[k, j] = _get_pair_prob(ids_2[k], ids_1[j], pair_keys, pair_probs, default_prob)
+        pair_probs_1 = np.empty((ids_1.shape[0], ids.shape[0]))
+        for j in range(ids_1.shape[0]):
+            for i in range(ids.shape[0]):
+                pair_probs_1[j, i] = _get_pair_prob(ids_1[j], ids[i], pair_keys, pair_probs, default_prob)
+        pair_probs_2 = np.empty((ids_2.shape[0], ids.shape[0]))
+        for k in range(ids_2.shape[0]):
+            for i in range(ids.shape[0]):
+                pair_probs_2[k, i] = _get_pair_prob(ids_2[k], ids[i], pair_keys, pair_probs, default_prob)
+
+        scores = np.empty(ids.shape[0])
+        picks_1 = np.zeros(ids.shape[0], dtype=np.int64)
+        picks_2 = np.zeros(ids.shape[0], dtype=np.int64)
+        for i in range(ids.shape[0]):
+            mx_score = -np.inf
+            for j in range(ids_1.shape[0]):
+                for k in range(ids_2.shape[0]):
+                    curr_score = prev_scores[k] + pair_probs_2_1[k, j] + pair_probs_1[j, i] + pair_probs_2[k, i]
+                    if curr_score > mx_score:
+                        mx_score, picks_1[i], picks_2[i] = curr_score, j, k
+            scores[i] = mx_score
+        return scores, picks_1, picks_2
+else:
+    _viterbi_step = None
+
+
 class ContextModel(object):
     """
     Context Model to suggest most suitable word in a sentence from given list of suggested words
@@ -59,69 +133,201 @@ class ContextModel(object):
 
     def __init__(self):
         self.default_prob = None
-        self.model_dict_count = None
-        self.model_dict = None
+        self.vocab = None
+        # sorted `(token_1_id << PAIR_ID_SHIFT) | token_2_id` keys of context pairs and their float32 probabilities
+        self.pair_keys = None
+        self.pair_probs = None
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        model_dict = state.pop('model_dict', None)
+        # counts of context pairs were kept on models saved before they were dropped after training
+        state.pop('model_dict_count', None)
+        self.__dict__.update(state)
+        if 'pair_keys' not in state:
+            # models saved on spello<=1.3.0 store probabilities in `model_dict` keyed by pair of tokens
+            self.set_pair_probs(list(model_dict), np.fromiter(model_dict.values(), dtype=np.float64,
+                                                              count=len(model_dict)))
+        elif self.pair_probs.dtype != PAIR_PROB_DTYPE:
+            self.pair_probs = self.pair_probs.astype(PAIR_PROB_DTYPE)
+
+    @property
+    def model_dict(self) -> Dict[Tuple[str, str], float]:
+        """
+        Deprecated, use `to_model_dict`. Every access builds a fresh dict of all context pairs
+        Returns:
+            (dict): dict having pair of tokens as key and probability as value
+        """
+        warnings.warn("ContextModel.model_dict is deprecated and builds a fresh dict of all context pairs on every "
+                      "access, call ContextModel.to_model_dict() once and keep the result instead",
+                      DeprecationWarning, stacklevel=2)
+        return self.to_model_dict()
+
+    def to_model_dict(self) -> Dict[Tuple[str, str], float]:
+        """
+        Build dict of context pairs and their probabilities. It is O(number of pairs), a fresh dict is built from
+        `pair_keys` and `pair_probs` on every call, so keep the result instead of calling this repeatedly
+        Returns:
+            (dict): dict having pair of tokens as key and probability as value
+        """
+        tokens = list(self.vocab)
+        token_id_mask = (1 << PAIR_ID_SHIFT) - 1
+        return {(tokens[pair_key >> PAIR_ID_SHIFT], tokens[pair_key & token_id_mask]): prob
+                for pair_key, prob in zip(self.pair_keys.tolist(), self.pair_probs.tolist())}
+
+    def set_pair_probs(self, pairs: List[Tuple[str, str]], probs: np.ndarray) -> None:
+        """
+        Assign an integer id to every token of given pairs and store pairs as sorted array of packed
+        `(token_1_id << PAIR_ID_SHIFT) | token_2_id` keys along with float32 array of their probabilities
+        Args:
+            pairs (list): list of context pairs
+            probs (np.ndarray): probability of each pair
+        Returns:
+            None
+        """
+        vocab: Dict[str, int] = {}
+        vocab_setdefault = vocab.setdefault
+        pair_ids = np.array([(vocab_setdefault(token_1, len(vocab)), vocab_setdefault(token_2, len(vocab)))
+                             for token_1, token_2 in pairs], dtype=np.uint64).reshape(-1, 2)
+        pair_keys = (pair_ids[:, 0] << np.uint64(PAIR_ID_SHIFT)) | pair_ids[:, 1]
+        order = np.argsort(pair_keys)
+        self.vocab = vocab
+        self.pair_keys = pair_keys[order]
+        self.pair_probs = probs[order].astype(PAIR_PROB_DTYPE)
 
     @staticmethod
-    def get_corrected_words_map(correct_sentence: str, original_sentence: str) -> Dict[str, str]:
+    def get_corrected_words_map(correct_tokens: List[str], original_tokens: List[str]) -> Dict[str, str]:
         """
         Create a dict having mapping of original words and their changed form in corrected sentence
         Args:
-            correct_sentence (str): sentence formed after context suggestion
-            original_sentence (str): original sentence
+            correct_tokens (list): tokens of sentence formed after context suggestion
+            original_tokens (list): tokens of original sentence
         Returns:
             (dict):
         """
-        words_map = {}
-        correct_words = correct_sentence.split()
-        original_words = original_sentence.split()
-
-        for correct_word, original_word in zip(correct_words, original_words):
-            if correct_word != original_word.lower():
-                words_map[original_word] = correct_word
-        return words_map
+        return {original_word: correct_word for correct_word, original_word in zip(correct_tokens, original_tokens)
+                if correct_word != original_word.lower()}
 
     def create_model_dict(
             self,
             sentences: List[str],
-    ) -> Dict[Tuple[str, ...], float]:
+    ) -> None:
 
         """
         Create context model dict from given list of sentences
         steps followed are:
          - for each sentence find all context pairs possible
          - create dict having context pairs and their count
-         - create dict from above to convert them into probabilities
+         - convert counts into probabilities and store them as arrays keyed by packed pair of token ids
         Args:
             sentences (list): list of sentences
         Returns:
-            (dict): model dict
+            None
         """
-        sentences_tokens = [
-            ContextModel.START_TOKENS + str(sentence).lower().strip().split() + ContextModel.END_TOKENS
-            for sentence in sentences
-        ]
-        model_dict_count: Dict[Tuple[str, ...], Union[float, int]] = defaultdict(int)
-        model_dict: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self.create_model_dict_from_tokens(str(sentence).lower().split() for sentence in sentences)
 
-        for sentence_tokens in sentences_tokens:
-            tokens = sentence_tokens
-            context_pairs = get_context_pairs(tokens)
-            for (pair, diff) in context_pairs:
-                model_dict_count[pair] = min(model_dict_count[pair] + 1, MAX_COUNT_ALLOWED)
+    def create_model_dict_from_tokens(
+            self,
+            sentences_tokens: Iterable[List[str]],
+    ) -> None:
+        """
+        Create context model dict from given lowercase tokens of sentences, same as `create_model_dict`
+        Args:
+            sentences_tokens (iterable): lowercase tokens of each sentence
+        Returns:
+            None
+        """
+        model_dict_count: Dict[Tuple[str, ...], Union[float, int]] = {}
+
+        for tokens in sentences_tokens:
+            update_context_pairs(ContextModel.START_TOKENS + tokens + ContextModel.END_TOKENS, model_dict_count,
+                                 MAX_COUNT_ALLOWED)
 
         values_model_dict_count = model_dict_count.values()
         total_count = float(sum(values_model_dict_count))
         self.default_prob = (min(values_model_dict_count) / total_count) * 0.5
         # to ensure self.default_prob is smaller than the smallest probability.
 
-        for tup in model_dict_count:
-            model_dict[tup] = model_dict_count[tup] / total_count
+        self.set_pair_probs(list(model_dict_count), np.fromiter(model_dict_count.values(), dtype=np.float64,
+                                                                count=len(model_dict_count)) / total_count)
 
-        self.model_dict = dict(model_dict)
-        self.model_dict_count = dict(model_dict_count)
+    def get_pair_scores(self, first_ids: List[int], second_ids: List[int]) -> np.ndarray:
+        """
+        Get matrix of context probabilities for every pair of token ids from given two lists of token ids
+        Args:
+            first_ids (list): token ids of first word of pairs
+            second_ids (list): token ids of second word of pairs
+        Returns:
+            (np.ndarray): matrix of shape (len(first_ids), len(second_ids)), default probability for unseen pairs
+        """
+        first_ids = np.array(first_ids, dtype=np.int64)[:, None]
+        second_ids = np.array(second_ids, dtype=np.int64)[None, :]
+        pair_keys = (first_ids.astype(np.uint64) << np.uint64(PAIR_ID_SHIFT)) | second_ids.astype(np.uint64)
+        indices = np.minimum(np.searchsorted(self.pair_keys, pair_keys), len(self.pair_keys) - 1)
+        found = (self.pair_keys[indices] == pair_keys) & (first_ids >= 0) & (second_ids >= 0)
+        # scores are summed in float64 even though probabilities are stored as float32
+        return np.where(found, self.pair_probs[indices].astype(np.float64), self.default_prob)
 
-        return self.model_dict
+    def get_step_scores(
+            self,
+            prev_scores: np.ndarray,
+            ids_2: List[int],
+            ids_1: List[int],
+            ids: List[int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score every word at a timestep against all combinations of suggestions at previous two timesteps
+        Args:
+            prev_scores (np.ndarray): best scores of suggestions two timesteps back
+            ids_2 (list): token ids of suggestions two timesteps back
+            ids_1 (list): token ids of suggestions at previous timestep
+            ids (list): token ids of suggestions at current timestep
+        Returns:
+            (np.ndarray): best score for each word at current timestep
+            (np.ndarray): index of picked suggestion at previous timestep for each word
+            (np.ndarray): index of picked suggestion two timesteps back for each word
+        """
+        if _viterbi_step is not None:
+            return _viterbi_step(prev_scores, np.array(ids_2, dtype=np.int64), np.array(ids_1, dtype=np.int64),
+                                 np.array(ids, dtype=np.int64), self.pair_keys, self.pair_probs, self.default_prob)
+
+        # scores[j, k, i] for word i at t, suggestion_1 j at t - 1 and suggestion_2 k at t - 2. Laying out
+        # j before k keeps argmax tie-breaking identical to scanning j in the outer loop and k in the inner one
+        scores = prev_scores[None, :, None] \
+            + self.get_pair_scores(ids_2, ids_1).T[:, :, None] \
+            + self.get_pair_scores(ids_1, ids)[:, None, :] \
+            + self.get_pair_scores(ids_2, ids)[None, :, :]
+        scores = scores.reshape(-1, len(ids))
+        picks = scores.argmax(axis=0)
+        picks_1, picks_2 = np.divmod(picks, len(ids_2))
+        return scores[picks, np.arange(len(ids))], picks_1, picks_2
+
+    def get_best_picks(self, suggestions_ids: List[List[int]]) -> List[int]:
+        """
+        Find index of most probable suggestion at each timestep, first two and last timesteps must have a single
+        suggestion
+        Args:
+            suggestions_ids (List[List[int]]): token ids of suggestions at each timestep
+        Returns:
+            (list): index of picked suggestion at each timestep
+        """
+        lengths = [len(suggestion_ids) for suggestion_ids in suggestions_ids]
+        # best score of each suggestion at each timestep along with backpointers to the picked suggestions at
+        # previous timestep (picks_1) and two timesteps back (picks_2)
+        scores = np.zeros((len(suggestions_ids), max(lengths)))
+        picks_1 = np.zeros((len(suggestions_ids), max(lengths)), dtype=np.int64)
+        picks_2 = np.zeros((len(suggestions_ids), max(lengths)), dtype=np.int64)
+        for t in range(2, len(suggestions_ids)):
+            scores[t, :lengths[t]], picks_1[t, :lengths[t]], picks_2[t, :lengths[t]] = self.get_step_scores(
+                scores[t - 2, :lengths[t - 2]], suggestions_ids[t - 2], suggestions_ids[t - 1], suggestions_ids[t])
+
+        # walk backpointers on python lists, indexing numpy arrays allocates a numpy scalar for every element
+        picks_1, picks_2 = picks_1.tolist(), picks_2.tolist()
+        picks = [0] * len(suggestions_ids)
+        t, pick = len(suggestions_ids) - 1, 0
+        while t >= 2:
+            picks[t - 1], picks[t - 2] = picks_1[t][pick], picks_2[t][pick]
+            t, pick = t - 2, picks[t - 2]
+        return picks
 
     def get_most_probable_sentence(
             self,
@@ -139,57 +345,69 @@ class ContextModel(object):
         Returns:
             (str): Spell corrected sentence.
         """
+        return ' '.join(self.get_most_probable_tokens(suggestions))
+
+    def get_most_probable_tokens(
+            self,
+            suggestions: List[List[str]]
+    ) -> List[str]:
+        """
+        Same as `get_most_probable_sentence` but return tokens of most probable sentence instead of joining them
+        Args:
+            suggestions (List[List[str]]): List of lists representation of all probable sentences.
+
+        Returns:
+            (list): tokens of spell corrected sentence
+        """
+        if all(len(suggestion) == 1 for suggestion in suggestions):
+            return [suggestion[0] for suggestion in suggestions]
+
         sent_word_count = len(suggestions)
         suggestions = [[tok] for tok in ContextModel.START_TOKENS] + suggestions + \
                       [[tok] for tok in ContextModel.END_TOKENS]
-        memory = [[MemoryItem(score=0.0, decoded=tuple())], [MemoryItem(score=0.0, decoded=tuple())]]
-        for t in range(2, len(suggestions)):
-            memory.append([])
-            for i, word in enumerate(suggestions[t]):
-                mx_score, pick_1, pick_2 = 0, 0, 0
-                for j, suggestion_1 in enumerate(suggestions[t - 1]):
-                    for k, suggestion_2 in enumerate(suggestions[t - 2]):
-                        curr_score = memory[-3][k].score \
-                                     + self.model_dict.get((suggestion_2, suggestion_1), self.default_prob) \
-                                     + self.model_dict.get((suggestion_1, word), self.default_prob) \
-                                     + self.model_dict.get((suggestion_2, word), self.default_prob)
-                        if curr_score > mx_score:
-                            mx_score, pick_1, pick_2 = curr_score, j, k
-                memory_item = MemoryItem(score=mx_score, decoded=memory[-3][pick_2].decoded + (pick_2, pick_1,))
-                memory[-1].append(memory_item)
-            memory = memory[1:]
-
-        decoded = ' '.join([suggestions[t][i] for t, i in enumerate(memory[-1][0].decoded[-sent_word_count:],
-                                                                    start=2)])
-        # score = memory[-1][0].score
-        return decoded
+        vocab_get = self.vocab.get
+        suggestions_ids = [[vocab_get(tok, UNKNOWN_TOKEN_ID) for tok in suggestion] for suggestion in suggestions]
+
+        # every timestep is scored against the two timesteps before it, so two consecutive timesteps having a
+        # single suggestion split the sentence into spans which can be decoded independently of each other
+        spans = []
+        for t, suggestion in enumerate(suggestions):
+            if len(suggestion) > 1:
+                if spans and t - spans[-1][1] <= 2:
+                    spans[-1][1] = t
+                else:
+                    spans.append([t, t])
+
+        decoded = [0] * len(suggestions)
+        last = len(suggestions) - 1
+        for start, stop in spans:
+            # decode up to the single suggestion timestep that lies on the backpointer walk from the end token
+            end = stop + 2 if stop + 2 <= last and (last - stop) % 2 == 0 else stop + 1
+            decoded[start:stop + 1] = self.get_best_picks(suggestions_ids[start - 2:end + 1])[2:stop - start + 3]
+
+        return [suggestions[t][decoded[t]] for t in range(2, sent_word_count + 2)]
 
     def context_spell_correct(
             self,
-            sentence: str,
+            tokens: List[str],
             suggestions_dict: Dict[str, List[str]]
     ) -> (str, Dict[str, str]):
         """
         Get most probable suggestion for miss-spelled words from suggestions list
         Args:
-            sentence (str): sentence
+            tokens (list): tokens of sentence
             suggestions_dict (dict): dict having miss-spelled word as key and list of suggestions as values
         Returns(str, Dict[str, str]): Tuple containing corrected string and word-to-word correction dictionary.
         """
-        sentence_tokens = sentence.lower().split()
         possible_sent_list = []
-        for each in sentence_tokens:
-            if each in suggestions_dict:
-                possible_sent_list.append(suggestions_dict[each])
+        for token in tokens:
+            token = token.lower()
+            if token in suggestions_dict:
+                possible_sent_list.append(suggestions_dict[token])
             else:
-                possible_sent_list.append([each])
-
-        corrected_sent = self.get_most_probable_sentence(possible_sent_list)
-        corrected_dict = self.get_corrected_words_map(corrected_sent, sentence)
-        context_corrected_sentence = " " + sentence + " "
-        for token, suggestion in corrected_dict.items():
-            context_corrected_sentence = re.sub(" " + re.escape(token) + " ",
-                                                " " + suggestion + " ",
-                                                context_corrected_sentence)
-        context_corrected_sentence = context_corrected_sentence.strip()
+                possible_sent_list.append([token])
+
+        corrected_tokens = self.get_most_probable_tokens(possible_sent_list)
+        corrected_dict = self.get_corrected_words_map(corrected_tokens, tokens)
+        context_corrected_sentence = " ".join(corrected_dict.get(token, token) for token in tokens)
         return context_corrected_sentence, corrected_dict
@@ -1,24 +1,31 @@
 import logging
-import operator
 import os
 import pickle
 import re
 import warnings
 from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Tuple, Any, Union, Optional
+from typing import Dict, Iterable, List, Tuple, Any, Union, Optional
 
 from spello.config import Config
 from spello.context.context import ContextModel
 from spello.phoneme.phoneme import PhonemeModel
 from spello.settings import logger, loglevel
 from spello.symspell.symspell import SymSpell
-from spello.utils import get_clean_text
+from spello.utils import get_clean_text, get_clean_tokens
 from spello.utils import mkdirs
 
 ORIGINAL_TEXT = 'original_text'
 CORRECTED_TEXT = 'spell_corrected_text'
 CORRECTIONS_DICT = 'correction_dict'
+SUGGESTIONS_CACHE_SIZE = 4096
+MAX_SUGGESTIONS = 5
+DIGIT_RE = re.compile(r'\d')
+# highest pickle protocol readable on every supported python version (>=3.6), protocol 5 needs python 3.8
+PICKLE_PROTOCOL = 4
 
 
 class SpellCorrectionModel(object):
@@ -48,22 +55,57 @@ class SpellCorrectionModel(object):
         self.symspell_model = None
         self.phoneme_model = None
         self.context_model = None
+        self._known_words = set()
+        # per instance LRU cache of word suggestions, bound method is wrapped so that cache belongs to this model
+        self._correct_word = lru_cache(maxsize=SUGGESTIONS_CACHE_SIZE)(self._correct_word)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # cached bound method can not be pickled, it is recreated on unpickling
+        state = self.__dict__.copy()
+        state.pop('_correct_word', None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._correct_word = lru_cache(maxsize=SUGGESTIONS_CACHE_SIZE)(self._correct_word)
 
     def set_default_config(self):
         self.config = Config()
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """
+        Clear cached word suggestions. Cache is cleared automatically on training, loading a model and resetting
+        config, call this after changing any value of `self.config` to get suggestions as per new config
+        Returns:
+            None
+        """
+        self._correct_word.cache_clear()
 
-    def symspell_train(self, words_counter: Dict[str, int]) -> 'SymSpell':
+    def symspell_train(self, words_counter: Dict[str, int], max_workers: int = 1) -> 'SymSpell':
         """
         Train symspell model
         Args:
             words_counter (dict): dict of word and their count
+            max_workers (int): number of processes to derive symspell deletes with, derived in this process if 1
         Returns:
             (SymSpell)
         """
         self.symspell_model = SymSpell(config=self.config, script=self.language)
-        self.symspell_model.create_dictionary_from_words(words_counter)
+        self.symspell_model.create_dictionary_from_words(words_counter, max_workers)
+        self._set_known_words()
+        self.clear_cache()
         return self.symspell_model
 
+    def _set_known_words(self) -> None:
+        """
+        Collect words which symspell considers correctly spelled, i.e. words from corpus with count > 0, so that
+        `spell_correct` can skip them without running phoneme and symspell lookups
+        Returns:
+            None
+        """
+        self._known_words = set(self.symspell_model.counts)
+
     def phoneme_train(self, words_counter: Dict[str, int]) -> 'PhonemeModel':
         """
         Train phoneme model
@@ -76,18 +118,23 @@ class SpellCorrectionModel(object):
             return self.phoneme_model
         self.phoneme_model = PhonemeModel(config=self.config, script=self.language)
         self.phoneme_model.create_phoneme_dictionary_from_words(words_counter)
+        self.clear_cache()
         return self.phoneme_model
 
-    def context_train(self, texts: List[str]) -> 'ContextModel':
+    def context_train(self, texts: Union[List[str], List[List[str]]], tokenized: bool = False) -> 'ContextModel':
         """
         Train context model
         Args:
-            texts (list): list of text
+            texts (list): list of text, or list of lowercase tokens of each text if tokenized is True
+            tokenized (bool): whether texts are already split to lowercase tokens
         Returns:
             (ContextModel)
         """
         self.context_model = ContextModel()
-        self.context_model.create_model_dict(texts)
+        if tokenized:
+            self.context_model.create_model_dict_from_tokens(texts)
+        else:
+            self.context_model.create_model_dict(texts)
         return self.context_model
 
     def context_suggestion(self, text: str, suggestions_dict: Dict[str, List[str]]) -> Tuple[str, Dict[str, str]]:
@@ -110,14 +157,15 @@ class SpellCorrectionModel(object):
         if not self.context_model or not suggestions_dict:
             suggestions_dict = {key: value[0] for key, value in suggestions_dict.items()}
             return text, suggestions_dict
-        text, context_corrections = self.context_model.context_spell_correct(text, suggestions_dict)
+        text, context_corrections = self.context_model.context_spell_correct(text.split(), suggestions_dict)
         return text, context_corrections
 
-    def train(self, data: Union[List[str], Dict[str, int]], **kwargs):
+    def train(self, data: Union[List[str], Dict[str, int]], max_workers: int = 1, **kwargs):
         """
         Train all models of spellcorrection
         Args:
             data (list|dict): list of text or dict having word and their count
+            max_workers (int): number of processes to build symspell dictionary with, built in this process if 1
         Returns:
             None
         """
@@ -130,28 +178,27 @@ class SpellCorrectionModel(object):
 
         if isinstance(data, list):
             # TODO: cleaning and preprocessing should really be left to the user!
-            texts = [get_clean_text(text) for text in data]
-            lower_case_texts = [text.lower() for text in texts]
+            texts_tokens = [get_clean_tokens(text) for text in data]
 
             logger.debug("Context model training started ...")
             # Context model get trained only when list of text are given for training
             # train context model: find most probable correct word for given suggestions for each word in texts
             # based on context word
-            self.context_train(lower_case_texts)
+            self.context_train(texts_tokens, tokenized=True)
 
-            tokens = " ".join(lower_case_texts).strip().split()
-
-            words_counter = dict(Counter(tokens))
+            words_counter = Counter()
+            for tokens in texts_tokens:
+                words_counter.update(tokens)
 
         elif isinstance(data, dict):
             words_counter = {word.lower(): count for word, count in data.items()}
 
-        words_counter = {word: count for word, count in words_counter.items()
-                         if self.config.min_length_for_spellcorrection}
+        min_length = self.config.min_length_for_spellcorrection
+        words_counter = {word: count for word, count in words_counter.items() if len(word) >= min_length}
 
         logger.debug("Symspell training started ...")
         # train symspell model: give suggestion based on edit distance
-        self.symspell_train(words_counter)
+        self.symspell_train(words_counter, max_workers)
 
         logger.debug("Phoneme training started ...")
         # train phoneme model: give suggestion for similar sounding words
@@ -178,9 +225,11 @@ class SpellCorrectionModel(object):
         Returns:
             (list): list of suggested words
         """
-        if ((self.config.min_length_for_spellcorrection > len(word)) or
-                (len(word) > self.config.max_length_for_spellcorrection) or
-                (re.search(r'\d', word))):
+        config = self.config
+        word_len = len(word)
+        if ((word_len < config.min_length_for_spellcorrection) or
+                (word_len > config.max_length_for_spellcorrection) or
+                (not word.isalpha() and DIGIT_RE.search(word))):
             return []
 
         phoneme = self.phoneme_model.spell_correct(word)
@@ -193,25 +242,25 @@ class SpellCorrectionModel(object):
             return []
         symspell_suggestions = symspell.suggestions
 
-        logger.debug(f"Symspell suggestions: {symspell_suggestions}")
-        logger.debug(f"Phoneme suggestions: {phoneme_suggestions}")
-
-        phoneme_suggestions = [(word, edit_distance, 0) for (word, edit_distance) in phoneme_suggestions]
-        symspell_suggestions = [(word, edit_distance, 1) for (word, edit_distance) in symspell_suggestions]
+        logger.debug("Symspell suggestions: %s", symspell_suggestions)
+        logger.debug("Phoneme suggestions: %s", phoneme_suggestions)
 
-        suggestions = list(phoneme_suggestions + symspell_suggestions)
-        suggestions.sort(key=operator.itemgetter(1, 2))
+        # rank suggestions on edit distance, sort is stable so on ties phoneme suggestions come first and each
+        # source keeps its own order
+        ranked_suggestions = sorted(chain(phoneme_suggestions, symspell_suggestions), key=itemgetter(1))
 
-        # filtering duplicate suggestions
-        unique_suggestions = set()
         final_suggestions = []
-        for (suggestion, edit_distance, _) in suggestions:
-            if suggestion not in unique_suggestions:
-                final_suggestions.append((suggestion, edit_distance))
-                unique_suggestions.add(suggestion)
+        seen = set()
+        for suggestion, edit_distance in ranked_suggestions:
+            if suggestion in seen:
+                continue
+            seen.add(suggestion)
+            final_suggestions.append((suggestion, edit_distance))
+            if len(final_suggestions) == MAX_SUGGESTIONS:
+                break
         return final_suggestions
 
-    def _correct_word(self, word: str) -> List[str]:
+    def _correct_word(self, word: str) -> Tuple[str, ...]:
         """
         Suggest words for given word, follow below steps:
             - check if length of word is eligible for correction from min max length allowed from config,
@@ -228,10 +277,54 @@ class SpellCorrectionModel(object):
         Args:
             word (str): word to be corrected
         Returns:
-            (list): list of suggested words
+            (tuple): suggested words, a tuple as results are cached and shared between calls
+        """
+        return tuple(suggestion for suggestion, _ in self.suggest(word))
+
+    def _get_suggestions_dict(self, tokens: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Get suggestions for misspelled words among given lowercase tokens
+        Args:
+            tokens (iterable): lowercase tokens
+        Returns:
+            (dict): dict with misspelled words and their list of suggestions
+        """
+        known_words = self._known_words
+        # correct each distinct token once, dict keeps tokens in order of their first occurrence
+        unknown_tokens = [token for token in dict.fromkeys(tokens) if token not in known_words]
+        tokens_suggestions = map(self._correct_word, unknown_tokens)
+        return {token: list(token_suggestion)
+                for token, token_suggestion in zip(unknown_tokens, tokens_suggestions) if token_suggestion}
+
+    def _get_spellcorrection_result(
+            self,
+            text: str,
+            clean_text: str,
+            suggestions_dict: Dict[str, List[str]]
+    ) -> Dict[str, Any]:
+        """
+        Pick most suitable suggestions for misspelled words of text using context model and create result dict
+        Args:
+            text (str): original text
+            clean_text (str): cleaned text
+            suggestions_dict (dict): dict with misspelled words of text and their list of suggestions
+        Returns:
+            (dict): dict having original text, spell corrected text and token level corrections
         """
-        suggestions = [suggestion for suggestion, _ in self.suggest(word)]
-        return suggestions
+        logger.debug("Suggestions dict from phoneme and symspell are: %s", suggestions_dict)
+
+        context_corrected_text, context_corrections = self.context_suggestion(clean_text, suggestions_dict)
+
+        logger.debug("text after context model: %s", context_corrected_text)
+
+        spellcorrection_result = {
+            ORIGINAL_TEXT: text,
+            CORRECTED_TEXT: context_corrected_text,
+            CORRECTIONS_DICT: context_corrections
+        }
+
+        logger.debug("Spell-correction Results %s", spellcorrection_result)
+        return spellcorrection_result
 
     def spell_correct(self, text: str, verbose=0) -> Dict[str, Any]:
         """
@@ -255,34 +348,53 @@ class SpellCorrectionModel(object):
         levels = [logging.CRITICAL, logging.ERROR, logging.INFO, logging.DEBUG]
         verbosity = min(verbose, len(levels) - 1)
         with loglevel(levels[verbosity]):
-            spellcorrection_result = {
-                ORIGINAL_TEXT: text,
-                CORRECTED_TEXT: text,
-                CORRECTIONS_DICT: {}
-            }
-
-            suggestions_dict = {}
             # TODO: cleaning and preprocessing should really be left to the user!
             clean_text = get_clean_text(text)
-            tokens = clean_text.split()
-            for token in tokens:
-                lowercase_token = token.lower()
-                token_suggestion = self._correct_word(lowercase_token)
-                if token_suggestion:
-                    suggestions_dict[lowercase_token] = token_suggestion
-
-            logger.debug(f"Suggestions dict from phoneme and symspell are: {suggestions_dict}")
+            suggestions_dict = self._get_suggestions_dict(token.lower() for token in clean_text.split())
+            spellcorrection_result = self._get_spellcorrection_result(text, clean_text, suggestions_dict)
 
-            context_corrected_text, context_corrections = self.context_suggestion(clean_text, suggestions_dict)
+        return spellcorrection_result
 
-            logger.debug(f"text after context model: {context_corrected_text}")
+    def spell_correct_batch(self, texts: List[str], verbose=0) -> List[Dict[str, Any]]:
+        """
+        Get spell corrected text, and dict of token level suggestion for each of given texts. Suggestions are
+        looked up only once for every distinct token across all texts
+        Args:
+            texts (list): list of texts
+            verbose (int): define verbose level
+        Returns:
+            (list): list of dicts as returned by `spell_correct`, one for each text
 
-            spellcorrection_result[CORRECTED_TEXT] = context_corrected_text
-            spellcorrection_result[CORRECTIONS_DICT] = context_corrections
+        Examples:
+            >>> texts = ['i wnt to play kricket', 'i wnt to book a flight']
+            >>> SpellCorrectionModel().spell_correct_batch(texts)
+            [
+                {
+                    'original_text': 'i wnt to play kricket',
+                    'spell_corrected_text': 'i want to play cricket',
+                    'correction_dict': {'wnt': 'want', 'kricket': 'cricket'}
+                },
+                {
+                    'original_text': 'i wnt to book a flight',
+                    'spell_corrected_text': 'i want to book a flight',
+                    'correction_dict': {'wnt': 'want'}
+                }
+            ]
+        """
+        levels = [logging.CRITICAL, logging.ERROR, logging.INFO, logging.DEBUG]
+        verbosity = min(verbose, len(levels) - 1)
+        with loglevel(levels[verbosity]):
+            # TODO: cleaning and preprocessing should really be left to the user!
+            clean_texts = [get_clean_text(text) for text in texts]
+            texts_tokens = [[token.lower() for token in clean_text.split()] for clean_text in clean_texts]
+            words_suggestions = self._get_suggestions_dict(chain.from_iterable(texts_tokens))
 
-            logger.debug(f"Spell-correction Results {spellcorrection_result}")
+            spellcorrection_results = []
+            for text, clean_text, tokens in zip(texts, clean_texts, texts_tokens):
+                suggestions_dict = {token: words_suggestions[token] for token in tokens if token in words_suggestions}
+                spellcorrection_results.append(self._get_spellcorrection_result(text, clean_text, suggestions_dict))
 
-        return spellcorrection_result
+        return spellcorrection_results
 
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -315,13 +427,16 @@ class SpellCorrectionModel(object):
         # fix all config references downstream
         self.symspell_model.config = self.config
         self.phoneme_model.config = self.config
+        self._set_known_words()
+        self.clear_cache()
 
     def load(
             self,
             model_path: str,
             **kwargs
     ) -> 'SpellCorrectionModel':
-        model_state = pickle.load(open(model_path, 'rb'))
+        with open(model_path, 'rb') as model_file:
+            model_state = pickle.load(model_file)
         self.set_state(model_state)
         return self
 
@@ -329,6 +444,7 @@ class SpellCorrectionModel(object):
         save_dir = Path(model_save_dir)
         mkdirs(save_dir, err_if_already_exists=False)
         state = self.get_state()
-        pickle.dump(state, open(save_dir / 'model.pkl', "wb"))
         path = os.path.join(save_dir, 'model.pkl')
+        with open(path, 'wb') as model_file:
+            pickle.dump(state, model_file, protocol=PICKLE_PROTOCOL)
         return path
@@ -1,23 +1,128 @@
 import operator
+import re
+import sys
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
-from itertools import repeat
+from collections.abc import Mapping
+from itertools import accumulate, repeat
 
 from spello.phoneme.constant import (
     indic_char_map,
     indic_language_chars
 )
-from spello.utils import dameraulevenshtein, SpellSuggestions
+from spello.utils import get_edit_distances, SpellSuggestions
+
+# map letters to respective phoneme codes. Vowels and 'H', 'W' and 'Y' are represented by '.'. Two digit code '10'
+# of 'R' is kept as 'R' while collapsing duplicate codes, a two digit code never equals the single last character
+LATIN_SOUNDEX_CODES = {"BPV": "1", "F": "2", "C": "3", "GJ": "4", "KQ": "5", "SXZ": "6", "DT": "7", "L": "8",
+                       "MN": "9", "R": "R", "AEIOUHWY": "."}
+# matches a code followed by the same code, removing these keeps one code out of every run of duplicates
+LATIN_SOUNDEX_DUPLICATE_CODES_RE = re.compile(r'([1-9.])(?=\1)')
+
+
+class _LatinSoundexTable(dict):
+    """
+    Translation table for `str.translate` which deletes every character not having a phoneme code
+    """
+    def __missing__(self, key):
+        return None
+
+
+LATIN_SOUNDEX_TABLE = _LatinSoundexTable(
+    (ord(char), code) for chars, code in LATIN_SOUNDEX_CODES.items() for char in chars
+)
+
+
+def _get_indic_char_sounds(chars):
+    """
+    Map each char of indic script to its phoneme code, leaving out chars having code '0' as they are skipped in
+    soundex
+    Args:
+        chars (list): chars of indic script
+    Returns:
+        (dict): char and its phoneme code
+    """
+    char_sounds = {}
+    for index, char in enumerate(chars):
+        # first occurrence wins, same as `list.index`
+        char_sounds.setdefault(char, str(indic_char_map[index]))
+    return {char: char_sound for char, char_sound in char_sounds.items() if char_sound != '0'}
+
+
+INDIC_CHAR_SOUNDS = {script: _get_indic_char_sounds(chars) for script, chars in indic_language_chars.items()}
+
+
+class PackedPhonemeDict(Mapping):
+    """
+    Read only phoneme dict keeping sorted soundex codes and all words in flat arrays, which makes pickling and
+    unpickling it much faster than dict of sets. Words of a soundex code are sliced out only when it is looked up
+    """
+
+    def __init__(self, phoneme_dict):
+        """
+        Args:
+            phoneme_dict (dict): soundex code and words belonging to it
+        """
+        self.soundexes = sorted(phoneme_dict)
+        buckets = [phoneme_dict[soundex] for soundex in self.soundexes]
+        words = [word for bucket in buckets for word in bucket]
+        self.words = ''.join(words)
+        # end offset of every word in `self.words` and end index of every soundex code's words in word offsets
+        self.word_ends = array('I', accumulate(map(len, words)))
+        self.bucket_ends = array('I', accumulate(map(len, buckets)))
+
+    def _find(self, soundex):
+        index = bisect_left(self.soundexes, soundex)
+        if index < len(self.soundexes) and self.soundexes[index] == soundex:
+            return index
+        return -1
+
+    def __getitem__(self, soundex):
+        index = self._find(soundex)
+        if index < 0:
+            raise KeyError(soundex)
+        first = self.bucket_ends[index - 1] if index else 0
+        words, word_ends = self.words, self.word_ends
+        start = word_ends[first - 1] if first else 0
+        bucket = []
+        for end in word_ends[first:self.bucket_ends[index]]:
+            bucket.append(words[start:end])
+            start = end
+        return tuple(bucket)
+
+    def __contains__(self, soundex):
+        return self._find(soundex) >= 0
+
+    def __iter__(self):
+        return iter(self.soundexes)
+
+    def __len__(self):
+        return len(self.soundexes)
 
 
 class PhonemeModel(object):
     indic_languages = list(indic_language_chars.keys())
     supported_languages = indic_languages + ['en']
+    __slots__ = ('phoneme_dict', 'script', 'config')
 
     def __init__(self, config, script, phoneme_dict=None):
         self.phoneme_dict = phoneme_dict
         self.script = script
         self.config = config
 
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        if state['phoneme_dict'] is not None and not isinstance(state['phoneme_dict'], PackedPhonemeDict):
+            # pickle phoneme dict in flat layout, it stays packed after loading
+            state['phoneme_dict'] = PackedPhonemeDict(state['phoneme_dict'])
+        return state
+
+    def __setstate__(self, state):
+        # models pickled before `__slots__` was added carry their attributes as a plain `__dict__`
+        for name, value in state.items():
+            setattr(self, name, value)
+
     @staticmethod
     def get_latin_soundex(token):
         """
@@ -33,25 +138,12 @@ class PhonemeModel(object):
         """
         token = token.upper()
 
-        soundex = ""
+        # first letter of input is always the first letter of phoneme, it is prepended before collapsing so that a
+        # code same as the first letter is skipped too
+        soundex = LATIN_SOUNDEX_DUPLICATE_CODES_RE.sub('', token[0] + token[1:].translate(LATIN_SOUNDEX_TABLE))
 
-        # first letter of input is always the first letter of phoneme
-        soundex += token[0]
-
-        # create a dictionary which maps letters to respective phoneme codes. Vowels and 'H', 'W' and 'Y' will be
-        # represented by '.'
-        dictionary = {"BPV": "1", "F": "2", "C": "3", "GJ": "4", "KQ": "5", "SXZ": "6", "DT": "7", "L": "8",
-                      "MN": "9", "R": "10", "AEIOUHWY": "."}
-
-        for char in token[1:]:
-            for key in dictionary.keys():
-                if char in key:
-                    code = dictionary[key]
-                    if code != soundex[-1]:
-                        soundex += code
-
-        # remove vowels and 'H', 'W' and 'Y' from phoneme
-        soundex = soundex.replace(".", "")
+        # expand code of 'R' and remove vowels and 'H', 'W' and 'Y' from phoneme
+        soundex = (soundex[0] + soundex[1:].replace("R", "10")).replace(".", "")
 
         # trim or pad to make phoneme a 10-character code
         soundex = soundex[:10].ljust(10, "0")
@@ -75,20 +167,15 @@ class PhonemeModel(object):
         sndx = []
         fc = token[0]
 
-        # translate alpha chars in name to phoneme digits
+        # translate alpha chars in name to phoneme digits, chars with phoneme code 0 are not in the map and skipped
+        char_sounds = INDIC_CHAR_SOUNDS[self.script]
         for char in token[1:].lower():
-            if char not in indic_language_chars[self.script]:
-                continue
-            char_sound = str(indic_char_map[indic_language_chars[self.script].index(char)])
-
-            # remove all 0s from the phoneme code
-            if char_sound == '0':
+            char_sound = char_sounds.get(char)
+            if char_sound is None:
                 continue
 
             # duplicate consecutive phoneme digits are skipped
-            if len(sndx) == 0:
-                sndx.append(char_sound)
-            elif char_sound != sndx[-1]:
+            if not sndx or char_sound != sndx[-1]:
                 sndx.append(char_sound)
 
         # append first character to result
@@ -128,13 +215,8 @@ class PhonemeModel(object):
         Returns:
             (dict): phoneme dict
         """
-        phoneme_dict = defaultdict(set)
         words = " ".join(sentences).strip().split()
-
-        words_soundex = {word: self.get_soundex(word) for word in words if len(word) > 2}
-        for word, soundex in words_soundex.items():
-            phoneme_dict[soundex].add(word)
-        self.phoneme_dict = phoneme_dict
+        self.phoneme_dict = self._create_phoneme_dictionary(words)
         return self.phoneme_dict
 
     def create_phoneme_dictionary_from_words(self, words_counter):
@@ -151,13 +233,33 @@ class PhonemeModel(object):
         Returns:
             (dict): phoneme dict
         """
-        phoneme_dict = defaultdict(set)
-        words_soundex = {word: self.get_soundex(word) for word in words_counter if len(word) > 2}
-        for word, soundex in words_soundex.items():
-            phoneme_dict[soundex].add(word)
-        self.phoneme_dict = phoneme_dict
+        self.phoneme_dict = self._create_phoneme_dictionary(words_counter)
         return self.phoneme_dict
 
+    def _create_phoneme_dictionary(self, words):
+        """
+        Group words longer than 2 characters by their soundex code in a single pass
+        Args:
+            words (iterable): words, may repeat
+        Returns:
+            (dict): phoneme dict having soundex code as key and tuple of interned words as value
+        """
+        # dict of words keeps unique words of each soundex code in order of first occurrence
+        phoneme_dict = defaultdict(dict)
+        # resolve soundex function for script once instead of for every word
+        if self.script == "en":
+            get_soundex = self.get_latin_soundex
+        elif self.script in PhonemeModel.indic_languages:
+            get_soundex = self.get_indic_soundex
+        else:
+            get_soundex = self.get_soundex
+        # soundex is computed once for every distinct word, words of sentences repeat a lot
+        for word in dict.fromkeys(words):
+            if len(word) > 2:
+                phoneme_dict[get_soundex(word)][word] = None
+        # phoneme dict is only read after training, tuples take a fraction of memory of sets
+        return {soundex: tuple(map(sys.intern, soundex_words)) for soundex, soundex_words in phoneme_dict.items()}
+
     def spell_correct(self, word) -> SpellSuggestions:
         """
         Suggest words from same soundex code
@@ -198,18 +300,18 @@ class PhonemeModel(object):
 
         spell_suggestions = SpellSuggestions(is_correct=False, suggestions=[])
         word_soundex = self.get_soundex(word)
-        if not word_soundex or (word_soundex not in self.phoneme_dict):
+        # single lookup, it is a binary search for phoneme dict of a loaded model
+        possible_suggestions = self.phoneme_dict.get(word_soundex) if word_soundex else None
+        if not possible_suggestions:
             return spell_suggestions
 
-        if word in self.phoneme_dict[word_soundex]:
+        if word in possible_suggestions:
             spell_suggestions.is_correct = True
             return spell_suggestions
 
-        possible_suggestions = self.phoneme_dict[word_soundex]
-        distances = [dameraulevenshtein(word, s_word) for s_word in possible_suggestions]
-
         # if script belongs to indic language, don't filter suggestion based on edit distance
         if self.script in PhonemeModel.indic_languages:
+            distances = get_edit_distances(word, possible_suggestions)
             spell_suggestions.suggestions = [(word, distances[index])
                                              for index, word in enumerate(possible_suggestions)]
             return spell_suggestions
@@ -217,19 +319,22 @@ class PhonemeModel(object):
         suggestions = []
         word_len = len(word)
         edit_distance_allowed = self.config.phoneme_allowed_distance_map[word_len]
-        for index, s_word in enumerate(possible_suggestions):
-            if distances[index] <= edit_distance_allowed:
-                suggestions.append((s_word, distances[index]))
-
-            if self.config.allow_1_extra_edit_for_char_start:
-                edit_distance = edit_distance_allowed + 1
-                if s_word not in suggestions and s_word[0] == word[0] and distances[index] <= edit_distance:
-                    suggestions.append((s_word, distances[index]))
-
-            if self.config.allow_1_extra_edit_for_char_end:
-                edit_distance = edit_distance_allowed + 1
-                if s_word not in suggestions and s_word[-1] == word[-1] and distances[index] <= edit_distance:
-                    suggestions.append((s_word, distances[index]))
+        allow_extra_edit_for_char_start = self.config.allow_1_extra_edit_for_char_start
+        allow_extra_edit_for_char_end = self.config.allow_1_extra_edit_for_char_end
+        max_distance = edit_distance_allowed
+        if allow_extra_edit_for_char_start or allow_extra_edit_for_char_end:
+            max_distance += 1
+
+        # distances beyond max_distance are not computed fully, they come out as max_distance + 1 and get dropped
+        distances = get_edit_distances(word, possible_suggestions, max_distance)
+        for s_word, distance in zip(possible_suggestions, distances):
+            if distance <= edit_distance_allowed:
+                suggestions.append((s_word, distance))
+            elif distance <= max_distance and (
+                    (allow_extra_edit_for_char_start and s_word[0] == word[0]) or
+                    (allow_extra_edit_for_char_end and s_word[-1] == word[-1])):
+                # allow 1 extra edit if suggestion starts or ends with same character as of word
+                suggestions.append((s_word, distance))
 
         suggestions.sort(key=operator.itemgetter(1))
         spell_suggestions.suggestions = suggestions
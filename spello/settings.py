@@ -11,9 +11,15 @@ logger.setLevel(logging.DEBUG)
 
 @contextlib.contextmanager
 def loglevel(level):
+    # level of logger itself is set too, so that records below level are dropped before they are created
+    logger_level = logger.level
     levels = [handler.level for handler in logger.handlers]
+    logger.setLevel(level)
     for handler in logger.handlers:
         handler.setLevel(level)
-    yield
-    for handler, olevel in zip(logger.handlers, levels):
-        handler.setLevel(olevel)
+    try:
+        yield
+    finally:
+        logger.setLevel(logger_level)
+        for handler, olevel in zip(logger.handlers, levels):
+            handler.setLevel(olevel)
@@ -41,13 +41,93 @@ SOFTWARE.
 """
 
 import logging
-import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, combinations
 from timeit import default_timer as timer
 
-from spello.utils import dameraulevenshtein, SpellSuggestions
+from spello.utils import get_word_distance, SpellSuggestions
+
+try:
+    import marisa_trie
+except ImportError:
+    marisa_trie = None
 
 spellcorrection_logger = logging.getLogger('spellcorrection')
 
+# version of data returned by `SymSpell.get_dictionary_data`, 2 splits dictionary into counts and delete_map
+DICTIONARY_DATA_VERSION = 2
+
+# punctuation replaced with space before splitting sentences to words
+PUNCTUATION_TRANSLATION_TABLE = str.maketrans(dict.fromkeys(r""",+:?!"()!'.%[]""", ' '))
+
+
+class PackedDeleteMap(Mapping):
+    """
+    Read only delete map keeping every corpus word once and words of each delete as indices into them in flat arrays,
+    which takes a fraction of the memory of dict of lists and is much faster to pickle. Deletes are kept in a sorted
+    list searched with bisection, or in a marisa trie if asked for
+    """
+
+    def __init__(self, delete_map, words, use_trie=False):
+        """
+        Args:
+            delete_map (dict): delete and list of corpus words it can be derived from
+            words (iterable): all corpus words
+            use_trie (bool): keep deletes in a marisa trie, which is much smaller than sorted list but needs
+                marisa-trie installed to unpickle it too
+        """
+        if use_trie and marisa_trie is None:
+            raise ImportError("marisa-trie is required to keep deletes in a trie, install it with spello[fast]")
+        self.words = list(words)
+        word_indices = {word: index for index, word in enumerate(self.words)}
+        if use_trie:
+            # words of deletes are laid out in order of ids given to deletes by the trie
+            self.deletes = marisa_trie.Trie(delete_map)
+            buckets = [None] * len(self.deletes)
+            for delete, bucket in delete_map.items():
+                buckets[self.deletes[delete]] = bucket
+        else:
+            self.deletes = sorted(delete_map)
+            buckets = [delete_map[delete] for delete in self.deletes]
+        self.word_ids = array('I', [word_indices[word] for bucket in buckets for word in bucket])
+        # end index of every delete's words in word ids
+        self.bucket_ends = array('I', accumulate(map(len, buckets)))
+
+    def _find(self, delete):
+        if not isinstance(self.deletes, list):
+            return self.deletes.get(delete, -1)
+        index = bisect_left(self.deletes, delete)
+        if index < len(self.deletes) and self.deletes[index] == delete:
+            return index
+        return -1
+
+    def get(self, delete, default=None):
+        index = self._find(delete)
+        if index < 0:
+            return default
+        first = self.bucket_ends[index - 1] if index else 0
+        words = self.words
+        return tuple([words[word_id] for word_id in self.word_ids[first:self.bucket_ends[index]]])
+
+    def __getitem__(self, delete):
+        bucket = self.get(delete)
+        if bucket is None:
+            raise KeyError(delete)
+        return bucket
+
+    def __contains__(self, delete):
+        return self._find(delete) >= 0
+
+    def __iter__(self):
+        return iter(self.deletes)
+
+    def __len__(self):
+        return len(self.deletes)
+
 
 class SymSpell:
     # TODO: remove `verbose` as argument as it can be configured via `config`
@@ -70,11 +150,94 @@ class SymSpell:
             script (str): language script
         """
         self.max_edit_distance = max_edit_distance
-        self.dictionary = {}
+        # count of each word in corpus, only words from corpus are keys so membership means word is spelled
+        # correctly, and corpus words from which each delete (or word itself) can be derived
+        self.counts = {}
+        self.delete_map = {}
         self.longest_word_length = 0
         self.script = script
         self.config = config
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # pickle delete map in packed layout, it stays packed after loading
+        state['delete_map'] = self.get_packed_delete_map()
+        return state
+
+    def __setstate__(self, state):
+        # models pickled before counts and delete_map were split keep both in a single `dictionary`
+        dictionary = state.pop('dictionary', None)
+        self.__dict__.update(state)
+        if dictionary is not None:
+            self.counts, self.delete_map = self.split_dictionary(dictionary)
+
+    @property
+    def dictionary(self):
+        """
+        Combined view of counts and delete_map in older format, built on every access
+
+        Returns:
+            dictionary (dict): dict of word or delete to tuple of (list of suggested corrections, count in corpus)
+        """
+        dictionary = {item: (words, 0) for item, words in self.delete_map.items()}
+        for word, count in self.counts.items():
+            dictionary[word] = (self.delete_map.get(word, []), count)
+        return dictionary
+
+    def get_packed_delete_map(self):
+        """
+        Get delete map in packed layout, which is much smaller and faster to serialize than dict of lists. Deletes
+        are kept in a sorted list unless delete map was already packed with `pack_delete_map`
+
+        Returns:
+            (PackedDeleteMap): read only delete map
+        """
+        if isinstance(self.delete_map, PackedDeleteMap):
+            return self.delete_map
+        return PackedDeleteMap(self.delete_map, self.counts)
+
+    def pack_delete_map(self, use_trie=False):
+        """
+        Replace delete map with its packed layout, which is also used when the model is pickled
+
+        Args:
+            use_trie (bool): keep deletes in a marisa trie, pickled models then need marisa-trie to be loaded
+
+        Returns:
+            None
+        """
+        if isinstance(self.delete_map, PackedDeleteMap):
+            self.delete_map = {item: list(words) for item, words in self.delete_map.items()}
+        self.delete_map = PackedDeleteMap(self.delete_map, self.counts, use_trie)
+
+    def unpack_delete_map(self):
+        """
+        Replace packed delete map of a loaded model with dict of lists, lookups in which are faster than bisection
+        or trie lookups of packed layout at the cost of much more memory. Delete map is packed again (in a sorted
+        list) when the model is pickled
+
+        Returns:
+            None
+        """
+        if not isinstance(self.delete_map, dict):
+            self.delete_map = {item: list(words) for item, words in self.delete_map.items()}
+
+    @staticmethod
+    def split_dictionary(dictionary):
+        """
+        Split dictionary in older format to counts and delete_map
+
+        Args:
+            dictionary (dict): dict of word or delete to tuple of (list of suggested corrections, count in corpus)
+
+        Returns:
+            counts (dict): count of each word in corpus
+            delete_map (dict): list of corpus words for each delete
+        """
+        counts = {item: count for item, (_, count) in dictionary.items() if count}
+        delete_map = {item: words for item, (words, _) in dictionary.items() if words}
+        return counts, delete_map
+
     @staticmethod
     def get_deletes_list(w):
         """
@@ -86,9 +249,6 @@ class SymSpell:
         Returns:
             deletes (list): list of words
         """
-        deletes = []
-        queue = [w]
-
         if len(w) <= 2:
             return [w]
         elif len(w) == 3:
@@ -99,58 +259,54 @@ class SymSpell:
             max_edit_distance = 3
         else:
             return [w]
-        for d in range(max_edit_distance):
-            temp_queue = []
-            for word in queue:
-                if len(word) > 1:
-                    for c in range(len(word)):  # character index
-                        word_minus_c = word[:c] + word[c + 1:]
-                        if word_minus_c not in deletes:
-                            deletes.append(word_minus_c)
-                        if word_minus_c not in temp_queue:
-                            temp_queue.append(word_minus_c)
-            queue = temp_queue
-        return deletes
-
-    def create_dictionary_entry(self, w, count=None):
+        # strings with k characters deleted are all combinations of len(w) - k characters of w in order, generating
+        # them with combinations and join skips slicing every intermediate delete. dict is used as an insertion
+        # ordered set
+        deletes = {}
+        for length in range(len(w) - 1, len(w) - max_edit_distance - 1, -1):
+            deletes.update(dict.fromkeys(map(''.join, combinations(w, length))))
+        return list(deletes)
+
+    def create_dictionary_entry(self, w, count=None, deletes=None):
         """
         Add word and its derived deletions to dictionary
 
         Args:
             w (str): word for which we need to derive strings with up to max_edit_distance characters deleted
             count (int): count of word in corpus
+            deletes (list): deletes of word if already derived, derived from word if None
         Returns:
             new_real_word_added (bool): whether word was added to dictionary i.e. first appearance of word in corpus
         """
         # check if word is already in dictionary
-        # dictionary entries are in the form: (list of suggested corrections,
-        # frequency of word in corpus)
+        # counts hold frequency of word in corpus, delete_map holds list of
+        # suggested corrections
         new_real_word_added = False
-        if w in self.dictionary:
-            # increment count of word in corpus
-            if count:
-                self.dictionary[w] = (self.dictionary[w][0], count)
-            else:
-                self.dictionary[w] = (self.dictionary[w][0], self.dictionary[w][1] + 1)
-        else:
-            self.dictionary[w] = ([], count)
+        # packed delete map of a loaded model is read only, it is unpacked to add more words
+        self.unpack_delete_map()
+        previous_count = self.counts.get(w, 0)
+        if w not in self.counts and w not in self.delete_map:
             self.longest_word_length = max(self.longest_word_length, len(w))
+        # increment count of word in corpus
+        self.counts[w] = count if count else previous_count + 1
 
-        if self.dictionary[w][1] > 0:
+        if previous_count == 0 and self.counts[w] > 0:
             # first appearance of word in corpus
             # n.b. word may already be in dictionary as a derived word
             # (deleting character from a real word)
             # but counter of frequency of word in corpus is not incremented
             # in those cases)
+            # deletes of a word only depend on the word, so they are added once on its first appearance
             new_real_word_added = True
-            deletes = self.get_deletes_list(w)
+            if deletes is None:
+                deletes = self.get_deletes_list(w)
             for item in deletes:
-                if item in self.dictionary:
-                    # add (correct) word to delete's suggested correction list
-                    self.dictionary[item][0].append(w)
+                # add (correct) word to delete's suggested correction list
+                # note frequency of word in corpus is not incremented
+                if item in self.delete_map:
+                    self.delete_map[item].append(w)
                 else:
-                    # note frequency of word in corpus is not incremented
-                    self.dictionary[item] = ([w], 0)
+                    self.delete_map[item] = [w]
 
         return new_real_word_added
 
@@ -162,57 +318,67 @@ class SymSpell:
             lines (list): list of sentences
 
         Returns:
-            dictionary (dict): spell check dictionary
+            counts (dict): count of each word in spell check dictionary
         """
         total_word_count = 0
         unique_word_count = 0
         start_time = timer()
         spellcorrection_logger.info("Creating spell check dictionary...")
-        punctuation = r""",+:?!"()!'.%[]"""
-        pattern = re.compile(re.escape(punctuation))
         for line in lines:
-            line = pattern.sub(' ', line.lower().strip())
-            words = line.lower().strip().split()
-            for word in words:
+            for word in line.lower().translate(PUNCTUATION_TRANSLATION_TABLE).split():
                 total_word_count += 1
                 if self.create_dictionary_entry(word):
                     unique_word_count += 1
         run_time = timer() - start_time
-        spellcorrection_logger.info("%.2f seconds to run" % run_time)
-        spellcorrection_logger.info("total words processed: %i" % total_word_count)
-        spellcorrection_logger.info("total unique words in corpus: %i" % unique_word_count)
-        spellcorrection_logger.info("total items in dictionary (corpus words & deletions): %i" % len(self.dictionary))
-        spellcorrection_logger.info("edit distance for deletions: %i" % self.max_edit_distance)
-        spellcorrection_logger.info("length of longest word in corpus: %i" % self.longest_word_length)
-        return self.dictionary
-
-    def create_dictionary_from_words(self, words_counter):
+        spellcorrection_logger.info("%.2f seconds to run", run_time)
+        spellcorrection_logger.info("total words processed: %i", total_word_count)
+        spellcorrection_logger.info("total unique words in corpus: %i", unique_word_count)
+        spellcorrection_logger.info("total corpus words in dictionary: %i", len(self.counts))
+        spellcorrection_logger.info("total deletions in dictionary: %i", len(self.delete_map))
+        spellcorrection_logger.info("edit distance for deletions: %i", self.max_edit_distance)
+        spellcorrection_logger.info("length of longest word in corpus: %i", self.longest_word_length)
+        return self.counts
+
+    def create_dictionary_from_words(self, words_counter, max_workers=1):
         """
         Create dictionary from list of sentences
 
         Args:
             words_counter (dict): dict with word and their count
+            max_workers (int): number of processes to derive deletes of words with, deletes are derived in this
+                process if 1. Dictionary itself is always filled in this process
 
         Returns:
-            dictionary (dict): spell check dictionary
+            counts (dict): count of each word in spell check dictionary
         """
         total_word_count = 0
         unique_word_count = 0
         start_time = timer()
         spellcorrection_logger.info("Creating spell check dictionary...")
 
-        for word, count in words_counter.items():
-            total_word_count += 1
-            if self.create_dictionary_entry(word, count):
-                unique_word_count += 1
+        if max_workers > 1 and len(words_counter) > 1:
+            # deletes only depend on the word, so they are derived in worker processes and merged here in order
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                chunksize = max(1, len(words_counter) // (max_workers * 4))
+                words_deletes = executor.map(self.get_deletes_list, words_counter, chunksize=chunksize)
+                for (word, count), deletes in zip(words_counter.items(), words_deletes):
+                    total_word_count += 1
+                    if self.create_dictionary_entry(word, count, deletes):
+                        unique_word_count += 1
+        else:
+            for word, count in words_counter.items():
+                total_word_count += 1
+                if self.create_dictionary_entry(word, count):
+                    unique_word_count += 1
         run_time = timer() - start_time
-        spellcorrection_logger.info("%.2f seconds to run" % run_time)
-        spellcorrection_logger.info("total words processed: %i" % total_word_count)
-        spellcorrection_logger.info("total unique words in corpus: %i" % unique_word_count)
-        spellcorrection_logger.info("total items in dictionary (corpus words & deletions): %i" % len(self.dictionary))
-        spellcorrection_logger.info("edit distance for deletions: %i" % self.max_edit_distance)
-        spellcorrection_logger.info("length of longest word in corpus: %i" % self.longest_word_length)
-        return self.dictionary
+        spellcorrection_logger.info("%.2f seconds to run", run_time)
+        spellcorrection_logger.info("total words processed: %i", total_word_count)
+        spellcorrection_logger.info("total unique words in corpus: %i", unique_word_count)
+        spellcorrection_logger.info("total corpus words in dictionary: %i", len(self.counts))
+        spellcorrection_logger.info("total deletions in dictionary: %i", len(self.delete_map))
+        spellcorrection_logger.info("edit distance for deletions: %i", self.max_edit_distance)
+        spellcorrection_logger.info("length of longest word in corpus: %i", self.longest_word_length)
+        return self.counts
 
     def get_suggestions(self, string, silent=False):
         """
@@ -241,13 +407,15 @@ class SymSpell:
 
         suggest_dict = {}
         min_suggest_len = float('inf')
+        # string is prepared for distance calculation once for all suggested items
+        string_distance = get_word_distance(string)
+        counts, delete_map = self.counts, self.delete_map
 
-        queue = [string]
-        q_dictionary = {}  # items other than string that we've checked
+        queue = deque([string])
+        q_checked = set()  # items other than string that we've checked
 
-        while len(queue) > 0:
-            q_item = queue[0]  # pop
-            queue = queue[1:]
+        while queue:
+            q_item = queue.popleft()
 
             # early exit
             if ((self.config.symspell_verbosity < 2) and (len(suggest_dict) > 0) and
@@ -255,8 +423,8 @@ class SymSpell:
                 break
 
             # process queue item
-            if (q_item in self.dictionary) and (q_item not in suggest_dict):
-                if self.dictionary[q_item][1] > 0:
+            if q_item not in suggest_dict:
+                if q_item in counts:
                     # word is in dictionary, and is a word from the corpus, and
                     # not already in suggestion list so add to suggestion
                     # dictionary, indexed by the word with value (frequency in
@@ -265,8 +433,7 @@ class SymSpell:
                     # than input string since only deletes are added (unless
                     # manual dictionary corrections are added)
                     assert len(string) >= len(q_item)
-                    suggest_dict[q_item] = (self.dictionary[q_item][1],
-                                            len(string) - len(q_item))
+                    suggest_dict[q_item] = (counts[q_item], len(string) - len(q_item))
                     # early exit
                     if (self.config.symspell_verbosity < 2) and (len(string) == len(q_item)):
                         break
@@ -276,7 +443,7 @@ class SymSpell:
                 # the suggested corrections for q_item as stored in
                 # dictionary (whether or not q_item itself is a valid word
                 # or merely a delete) can be valid corrections
-                for sc_item in self.dictionary[q_item][0]:
+                for sc_item in delete_map.get(q_item, ()):
                     if sc_item not in suggest_dict:
 
                         # compute edit distance
@@ -299,25 +466,25 @@ class SymSpell:
 
                         # calculate edit distance using, for example,
                         # Damerau-Levenshtein distance
-                        item_dist = dameraulevenshtein(sc_item, string)
+                        # distances beyond the largest one that can still be added are not computed fully
+                        max_distance = self.max_edit_distance
+                        if (self.config.symspell_verbosity < 2) and (min_suggest_len < max_distance):
+                            max_distance = min_suggest_len
+                        # length difference is a lower bound of edit distance, such items can not be added
+                        if abs(len(sc_item) - len(string)) > max_distance:
+                            continue
+                        item_dist = string_distance(sc_item, max_distance)
 
                         # do not add words with greater edit distance if
                         # verbose setting not on
                         if (self.config.symspell_verbosity < 2) and (item_dist > min_suggest_len):
                             pass
                         elif item_dist <= self.max_edit_distance:
-                            assert sc_item in self.dictionary  # should already be in dictionary if in suggestion list
-                            suggest_dict[sc_item] = (self.dictionary[sc_item][1], item_dist)
+                            assert sc_item in counts  # should already be in dictionary if in suggestion list
+                            suggest_dict[sc_item] = (counts[sc_item], item_dist)
                             if item_dist < min_suggest_len:
                                 min_suggest_len = item_dist
 
-                        # depending on order words are processed, some words
-                        # with different edit distances may be entered into
-                        # suggestions; trim suggestion dictionary if verbose
-                        # setting not on
-                        if self.config.symspell_verbosity < 2:
-                            suggest_dict = {k: v for k, v in suggest_dict.items() if v[1] <= min_suggest_len}
-
             # now generate deletes (e.g. a substring of string or of a delete)
             # from the queue item
             # as additional items to check -- add to end of queue
@@ -330,15 +497,22 @@ class SymSpell:
             elif (len(string) - len(q_item)) < self.max_edit_distance and len(q_item) > 1:
                 for c in range(len(q_item)):  # character index
                     word_minus_c = q_item[:c] + q_item[c + 1:]
-                    if word_minus_c not in q_dictionary:
+                    if word_minus_c not in q_checked:
                         queue.append(word_minus_c)
-                        q_dictionary[word_minus_c] = None  # arbitrary value, just to identify we checked this
+                        q_checked.add(word_minus_c)
+
+        # depending on order words are processed, some words
+        # with different edit distances may be entered into
+        # suggestions; trim suggestion dictionary if verbose
+        # setting not on
+        if self.config.symspell_verbosity < 2:
+            suggest_dict = {k: v for k, v in suggest_dict.items() if v[1] <= min_suggest_len}
 
         # queue is now empty: convert suggestions in dictionary to
         # list for output
         if not silent and self.config.symspell_verbosity != 0:
-            spellcorrection_logger.info("number of possible corrections: %i" % len(suggest_dict))
-            spellcorrection_logger.info("edit distance for deletions: %i" % self.max_edit_distance)
+            spellcorrection_logger.info("number of possible corrections: %i", len(suggest_dict))
+            spellcorrection_logger.info("edit distance for deletions: %i", self.max_edit_distance)
 
         # output option 1
         # sort results by ascending order of edit distance and descending
@@ -365,7 +539,8 @@ class SymSpell:
         Load dictionary data from dict
 
         Args:
-            dictionary_data (dict): dict containing max_edit_distance, longest_word_length, dictionary and script keys
+            dictionary_data (dict): dict containing max_edit_distance, longest_word_length, counts, delete_map and
+                script keys, older dict with dictionary key instead of counts and delete_map is also accepted
 
         Returns:
             None
@@ -378,7 +553,11 @@ class SymSpell:
 
         self.max_edit_distance = dictionary_data["max_edit_distance"]
         self.longest_word_length = dictionary_data["longest_word_length"]
-        self.dictionary = dictionary_data["dictionary"]
+        if "dictionary" in dictionary_data:
+            self.counts, self.delete_map = self.split_dictionary(dictionary_data["dictionary"])
+        else:
+            self.counts = dictionary_data["counts"]
+            self.delete_map = dictionary_data["delete_map"]
         self.script = dictionary_data["script"]
 
     def get_dictionary_data(self):
@@ -386,13 +565,16 @@ class SymSpell:
         Get dictionary data
 
         Returns:
-            dictionary_data (dict): dict containing max_edit_distance, longest_word_length, dictionary and script keys
+            dictionary_data (dict): dict containing version, max_edit_distance, longest_word_length, counts,
+                delete_map and script keys, delete_map is given in packed layout
 
         """
         dictionary_data = {
+            "version": DICTIONARY_DATA_VERSION,
             "max_edit_distance": self.max_edit_distance,
             "longest_word_length": self.longest_word_length,
-            "dictionary": self.dictionary,
+            "counts": self.counts,
+            "delete_map": self.get_packed_delete_map(),
             "script": self.script
         }
         return dictionary_data
@@ -436,8 +618,7 @@ class SymSpell:
 
         spell_suggestions = SpellSuggestions(is_correct=False, suggestions=[])
 
-        value = self.dictionary.get(word)
-        if value and value[1] > 0:
+        if word in self.counts:
             spell_suggestions.is_correct = True
             return spell_suggestions
 
@@ -447,18 +628,39 @@ class SymSpell:
             edit_distance_allowed = self.config.symspell_allowed_distance_map[word_len]
             suggestions = [(w, meta[1]) for w, meta in _suggestions if meta[1] <= edit_distance_allowed]
 
-            if self.config.allow_1_extra_edit_for_char_end:
+            allow_extra_edit_for_char_end = self.config.allow_1_extra_edit_for_char_end
+            allow_extra_edit_for_char_start = self.config.allow_1_extra_edit_for_char_start
+            if allow_extra_edit_for_char_end or allow_extra_edit_for_char_start:
                 edit_distance = edit_distance_allowed + 1
+                suggested_words = {w for w, _ in suggestions}
+                # words allowed for same first char are added before words allowed only for same last char
+                char_end_suggestions, char_start_suggestions = [], []
                 for w, meta in _suggestions:
-                    if w not in suggestions and w[0] == word[0] and meta[1] <= edit_distance:
-                        suggestions.append((w, meta[1]))
-
-            if self.config.allow_1_extra_edit_for_char_start:
-                edit_distance = edit_distance_allowed + 1
-                for w, meta in _suggestions:
-                    if w not in suggestions and w[-1] == word[-1] and meta[1] <= edit_distance:
-                        suggestions.append((w, meta[1]))
+                    if w in suggested_words or meta[1] > edit_distance:
+                        continue
+                    if allow_extra_edit_for_char_end and w[0] == word[0]:
+                        char_end_suggestions.append((w, meta[1]))
+                    elif allow_extra_edit_for_char_start and w[-1] == word[-1]:
+                        char_start_suggestions.append((w, meta[1]))
+                suggestions.extend(char_end_suggestions)
+                suggestions.extend(char_start_suggestions)
 
             spell_suggestions.suggestions = suggestions
 
         return spell_suggestions
+
+    def spell_correct_batch(self, words):
+        """
+        Spell correct list of words, each distinct word is corrected once and words found in dictionary skip the
+        suggestions search
+
+        Args:
+            words (list): words to be corrected
+        Returns:
+            (list): SpellSuggestions for each word in same order as words, repeated words share the same instance
+        """
+        words_suggestions = {}
+        for word in words:
+            if word not in words_suggestions:
+                words_suggestions[word] = self.spell_correct(word)
+        return [words_suggestions[word] for word in words]
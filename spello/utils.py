@@ -1,23 +1,133 @@
 import errno
 import os
 import re
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List, Sequence, Any, Union
+from typing import Callable, Optional, List, Sequence, Any, Union
 
-from nltk import ngrams
+import numpy as np
+
+try:
+    from rapidfuzz.distance import OSA
+    from rapidfuzz.process import cdist
+except ImportError:
+    OSA = None
+    cdist = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+PUNCTUATION_RE = re.compile(r'[.,:;\"?\\]')
+CURLY_BRACES_RE = re.compile(r'{.*}')
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _dameraulevenshtein_rows(codes1, codes2, max_distance):
+        # same dynamic programming as `dameraulevenshtein` over arrays of character codes, rows are rotated instead
+        # of allocated. Smallest value of a row never decreases for next rows, so once it exceeds max_distance the
+        # distance is known to exceed it too
+        len1, len2 = codes1.shape[0], codes2.shape[0]
+        twoago = np.zeros(len2 + 1, dtype=np.int64)
+        oneago = np.arange(len2 + 1)
+        thisrow = np.zeros(len2 + 1, dtype=np.int64)
+        for x in range(1, len1 + 1):
+            thisrow[0] = x
+            row_min = x
+            for y in range(1, len2 + 1):
+                cost = 0 if codes1[x - 1] == codes2[y - 1] else 1
+                distance = min(oneago[y] + 1, thisrow[y - 1] + 1, oneago[y - 1] + cost)
+                if (x > 1 and y > 1 and cost and codes1[x - 1] == codes2[y - 2] and
+                        codes1[x - 2] == codes2[y - 1]):
+                    distance = min(distance, twoago[y - 2] + 1)
+                thisrow[y] = distance
+                row_min = min(row_min, distance)
+            if row_min > max_distance:
+                return max_distance + 1
+            twoago, oneago, thisrow = oneago, thisrow, twoago
+        return min(oneago[len2], max_distance + 1)
+
+    @njit(cache=True)
+    def _dameraulevenshtein_bits(codes1, codes2):
+        # Hyyrö's bit-parallel algorithm for the same restricted distance, whole column of dynamic programming over
+        # codes1 (at most 64 chars) is kept as bit vectors of vertical +1/-1 deltas, so every char of codes2 is
+        # processed in a handful of 64 bit operations
+        len1 = codes1.shape[0]
+        one = np.uint64(1)
+        # match masks of codes1 for ascii chars, other chars are matched by scanning codes1
+        ascii_masks = np.zeros(128, dtype=np.uint64)
+        for x in range(len1):
+            if codes1[x] < 128:
+                ascii_masks[codes1[x]] |= one << np.uint64(x)
+        last_bit = one << np.uint64(len1 - 1)
+        vp = ~np.uint64(0)
+        vn = np.uint64(0)
+        d0 = np.uint64(0)
+        prev_mask = np.uint64(0)
+        distance = len1
+        for y in range(codes2.shape[0]):
+            code = codes2[y]
+            if code < 128:
+                mask = ascii_masks[code]
+            else:
+                mask = np.uint64(0)
+                for x in range(len1):
+                    if codes1[x] == code:
+                        mask |= one << np.uint64(x)
+            transpositions = (((~d0) & mask) << one) & prev_mask
+            d0 = (((mask & vp) + vp) ^ vp) | mask | vn | transpositions
+            hp = vn | ~(d0 | vp)
+            hn = d0 & vp
+            if hp & last_bit:
+                distance += 1
+            elif hn & last_bit:
+                distance -= 1
+            hp = (hp << one) | one
+            hn = hn << one
+            vp = hn | ~(d0 | hp)
+            vn = hp & d0
+            prev_mask = mask
+        return distance
+
+    @njit(cache=True)
+    def _dameraulevenshtein_codes(codes1, codes2, max_distance):
+        len1, len2 = codes1.shape[0], codes2.shape[0]
+        if abs(len1 - len2) > max_distance:
+            return max_distance + 1
+        if len1 == 0 or len2 == 0:
+            return min(len1 + len2, max_distance + 1)
+        if len1 <= 64:
+            return min(_dameraulevenshtein_bits(codes1, codes2), max_distance + 1)
+        if len2 <= 64:
+            return min(_dameraulevenshtein_bits(codes2, codes1), max_distance + 1)
+        return _dameraulevenshtein_rows(codes1, codes2, max_distance)
+else:
+    _dameraulevenshtein_codes = None
+
+
+def _get_char_codes(word: str) -> np.ndarray:
+    """
+    Get array of unicode code points of characters of word, as consumed by the numba compiled distance
+    """
+    return np.frombuffer(word.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
 
 
 class SpellSuggestions(object):
+    __slots__ = ('is_correct', 'suggestions')
+
     def __init__(self, is_correct: bool = False, suggestions: Optional[List[str]] = None):
         self.is_correct = is_correct
         self.suggestions = suggestions or []
 
 
-def dameraulevenshtein(seq1: Sequence[Any], seq2: Sequence[Any]):
+def dameraulevenshtein(seq1: Sequence[Any], seq2: Sequence[Any], max_distance: Optional[int] = None) -> int:
     """
     Calculate the Damerau-Levenshtein distance between sequences.
 
-    This method has not been modified from the original.
+    Based on the original from
     Source: http://mwh.geek.nz/2009/04/26/python-damerau-levenshtein-distance/
 
     This distance is the number of additions, deletions, substitutions,
@@ -43,50 +153,126 @@ def dameraulevenshtein(seq1: Sequence[Any], seq2: Sequence[Any]):
     Args:
        seq1 (str): word 1
        seq2 (str): word 2
+       max_distance (int): if given, distance greater than max_distance is not computed fully and is returned as
+           max_distance + 1
 
     Returns:
         edit_distance (int): Damerau-Levenshtein distance
     """
+    if OSA is not None:
+        # rapidfuzz's optimal string alignment distance is the same restricted Damerau-Levenshtein distance
+        # computed below, implemented in C
+        return OSA.distance(seq1, seq2, score_cutoff=max_distance)
+    if max_distance is not None and abs(len(seq1) - len(seq2)) > max_distance:
+        # distance is at least the difference in lengths
+        return max_distance + 1
+    if _dameraulevenshtein_codes is not None and isinstance(seq1, str) and isinstance(seq2, str):
+        if max_distance is None:
+            max_distance = max(len(seq1), len(seq2))
+        return int(_dameraulevenshtein_codes(_get_char_codes(seq1), _get_char_codes(seq2), max_distance))
+
     # Conceptually, this is based on a len(seq1) + 1 * len(seq2) + 1 matrix.
     # However, only the current and two previous rows are needed at once,
     # so we only store those.
-    oneago = None
-    thisrow = []
-    for num in range(1, len(seq2) + 1):
-        thisrow.append(num)
-    thisrow += [0]
-    for x in range(len(seq1)):
-        # Python lists wrap around for negative indices, so put the
-        # leftmost column at the *end* of the list. This matches with
-        # the zero-indexed strings and saves extra calculation.
-        twoago, oneago, thisrow = oneago, thisrow, [0] * len(seq2) + [x + 1]
-        for y in range(len(seq2)):
-            delcost = oneago[y] + 1
-            addcost = thisrow[y - 1] + 1
-            subcost = oneago[y - 1] + (seq1[x] != seq2[y])
-            thisrow[y] = min(delcost, addcost, subcost)
+    len2 = len(seq2)
+    twoago, oneago, thisrow = None, None, list(range(len2 + 1))
+    for x in range(1, len(seq1) + 1):
+        twoago, oneago, thisrow = oneago, thisrow, [x] + [0] * len2
+        for y in range(1, len2 + 1):
+            cost = int(seq1[x - 1] != seq2[y - 1])
+            distance = min(oneago[y] + 1, thisrow[y - 1] + 1, oneago[y - 1] + cost)
             # This block deals with transpositions
-            if x > 0 and y > 0 and seq1[x] == seq2[y - 1] and seq1[x - 1] == seq2[y] and seq1[x] != seq2[y]:
-                thisrow[y] = min(thisrow[y], twoago[y - 2] + 1)
-    return thisrow[len(seq2) - 1]
+            if x > 1 and y > 1 and cost and seq1[x - 1] == seq2[y - 2] and seq1[x - 2] == seq2[y - 1]:
+                distance = min(distance, twoago[y - 2] + 1)
+            thisrow[y] = distance
+        # smallest value of a row never decreases for next rows, so distance already exceeds max_distance
+        if max_distance is not None and min(thisrow) > max_distance:
+            return max_distance + 1
+    distance = thisrow[len2]
+    return distance if max_distance is None else min(distance, max_distance + 1)
+
+
+def get_edit_distances(word: str, candidates: Sequence[str], max_distance: Optional[int] = None) -> List[int]:
+    """
+    Calculate the Damerau-Levenshtein distance between word and each of the candidates, in one call to rapidfuzz
+    when it is installed, else with numba compiled distance when numba is installed
+    Args:
+        word (str): word
+        candidates (list): words to compare word with
+        max_distance (int): if given, distances greater than max_distance are not computed fully and are reported
+            as max_distance + 1
+    Returns:
+        (list): edit distance of word from each of the candidates
+    """
+    if cdist is not None:
+        return cdist([word], candidates, scorer=OSA.distance, score_cutoff=max_distance)[0].tolist()
+    # word is prepared only once for all candidates
+    word_distance = get_word_distance(word)
+    return [word_distance(candidate, max_distance) for candidate in candidates]
+
+
+def get_word_distance(word: str) -> Callable[[str, Optional[int]], int]:
+    """
+    Get a function calculating the Damerau-Levenshtein distance of given word from a candidate word. Word is
+    prepared only once for all candidates, e.g. converted to char codes for numba compiled distance
+    Args:
+        word (str): word
+    Returns:
+        (callable): function taking candidate word and optional max_distance (as in `dameraulevenshtein`) and
+            returning edit distance of candidate from word
+    """
+    if OSA is None and _dameraulevenshtein_codes is not None:
+        word_codes = _get_char_codes(word)
+        word_len = len(word)
+
+        def word_distance(candidate: str, max_distance: Optional[int] = None) -> int:
+            candidate_len = len(candidate)
+            if max_distance is None:
+                max_distance = max(word_len, candidate_len)
+            elif abs(word_len - candidate_len) > max_distance:
+                return max_distance + 1
+            return int(_dameraulevenshtein_codes(word_codes, _get_char_codes(candidate), max_distance))
+        return word_distance
+    return partial(dameraulevenshtein, word)
 
 
 def batch(iterable, n=1):
-    iter_len = len(iterable)
-    for ndx in range(0, iter_len, n):
-        yield iterable[ndx:min(ndx + n, iter_len)]
+    if isinstance(iterable, Sequence):
+        iter_len = len(iterable)
+        for ndx in range(0, iter_len, n):
+            yield iterable[ndx:min(ndx + n, iter_len)]
+        return
+    # any other iterable is consumed lazily, n items at a time
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, n))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, n))
 
 
 def get_ngrams(tokens, n):
-    return list(ngrams(tokens, n))
+    return list(zip(*(tokens[i:] for i in range(n))))
 
 
 def get_clean_text(sentence):
-    clean_text = re.sub(r'[.,:;\"?\\]', ' ', str(sentence))
-    clean_text = re.sub(r'{.*}', '', clean_text)
+    clean_text = PUNCTUATION_RE.sub(' ', str(sentence))
+    # most texts have no curly braces, substitution is skipped for them
+    if '{' in clean_text:
+        clean_text = CURLY_BRACES_RE.sub('', clean_text)
     return clean_text.strip()
 
 
+def get_clean_tokens(sentence):
+    """
+    Clean sentence same as `get_clean_text` and return its lowercase tokens
+    Args:
+        sentence (str): sentence
+    Returns:
+        (list): lowercase tokens of clean sentence
+    """
+    return get_clean_text(sentence).lower().split()
+
+
 def mkdirs(path: Union[str, Path], err_if_already_exists: bool = True) -> None:
     """
     Given a path to a directory, create the directory and all intermediate directories if they don't exist
@@ -0,0 +1,33 @@
+import pickle
+
+import pytest
+
+from spello.config import Config, PHONEME_ALLOWED_DISTANCES_MAP, SYMSPELL_ALLOWED_DISTANCES_MAP
+
+
+def test_default_distance_maps_are_read_only():
+    config = Config()
+    assert config.symspell_allowed_distance_map is SYMSPELL_ALLOWED_DISTANCES_MAP
+    with pytest.raises(TypeError):
+        config.symspell_allowed_distance_map[3] = 2
+
+
+def test_pickle_round_trip():
+    config = Config()
+    config.min_length_for_spellcorrection = 4
+    config.phoneme_allowed_distance_map = {3: 0, 4: 1}
+    unpickled = pickle.loads(pickle.dumps(config, protocol=4))
+    for name in Config.__slots__:
+        assert getattr(unpickled, name) == getattr(config, name), name
+    assert dict(unpickled.symspell_allowed_distance_map) == dict(SYMSPELL_ALLOWED_DISTANCES_MAP)
+    assert unpickled.phoneme_allowed_distance_map == {3: 0, 4: 1}
+    assert PHONEME_ALLOWED_DISTANCES_MAP[3] == 1
+
+
+def test_unpickle_config_without_slots():
+    # configs pickled before `__slots__` was added carry a plain `__dict__`, attributes missing in it keep defaults
+    config = Config.__new__(Config)
+    config.__setstate__({'max_length_for_spellcorrection': 12, 'symspell_allowed_distance_map': {3: 0}})
+    assert config.max_length_for_spellcorrection == 12
+    assert config.symspell_allowed_distance_map == {3: 0}
+    assert config.symspell_verbosity == 1
@@ -0,0 +1,90 @@
+import itertools
+import pickle
+import random
+
+import pytest
+
+from spello.context.context import ContextModel, UNKNOWN_TOKEN_ID
+
+SENTENCES = [
+    'i want to play cricket',
+    'i want to book a flight',
+    'i went to mumbai',
+    'play cricket with me',
+    'book a flight to delhi',
+    'i want to go to delhi',
+    'we went to play',
+]
+
+
+@pytest.fixture(scope='module')
+def context_model():
+    model = ContextModel()
+    model.create_model_dict(SENTENCES)
+    return model
+
+
+def get_sentence_score(model, tokens):
+    # decoder scores a timestep with the two timesteps before it and chains to two timesteps back, so the sentence
+    # score sums these context probabilities for every second timestep walking back from the end token
+    tokens = ContextModel.START_TOKENS + list(tokens) + ContextModel.END_TOKENS
+    ids = [model.vocab.get(token, UNKNOWN_TOKEN_ID) for token in tokens]
+
+    def pair_score(id_1, id_2):
+        return model.get_pair_scores([id_1], [id_2])[0, 0]
+
+    return sum(pair_score(ids[t - 2], ids[t - 1]) + pair_score(ids[t - 1], ids[t]) + pair_score(ids[t - 2], ids[t])
+               for t in range(len(ids) - 1, 1, -2))
+
+
+def test_single_suggestions_are_returned_as_is(context_model):
+    assert context_model.get_most_probable_tokens([['i'], ['xyz'], ['to']]) == ['i', 'xyz', 'to']
+
+
+def test_spans_are_decoded_with_their_context(context_model):
+    suggestions = [['i'], ['want', 'went'], ['to'], ['play', 'pray'], ['cricket'], ['and'], ['i'],
+                   ['want', 'went'], ['to'], ['book', 'look'], ['a'], ['flight', 'fight']]
+    assert context_model.get_most_probable_tokens(suggestions) == \
+        'i want to play cricket and i want to book a flight'.split()
+    assert context_model.get_most_probable_sentence([['play'], ['ticket', 'cricket'], ['with'], ['be', 'me']]) == \
+        'play cricket with me'
+
+
+def test_spans_match_best_full_sentence_score(context_model):
+    vocab = 'i want went to play pray cricket book a flight fight mumbai delhi with me we go'.split()
+    rng = random.Random(0)
+    for _ in range(200):
+        suggestions = []
+        for _ in range(rng.randint(1, 7)):
+            count = rng.choice([1, 1, 2, 3])
+            suggestions.append(rng.sample(vocab, count))
+        tokens = context_model.get_most_probable_tokens(suggestions)
+        best_score = max(get_sentence_score(context_model, candidate) for candidate in itertools.product(*suggestions))
+        assert [token in suggestion for token, suggestion in zip(tokens, suggestions)] == [True] * len(suggestions)
+        assert get_sentence_score(context_model, tokens) == pytest.approx(best_score, rel=1e-9, abs=1e-12)
+
+
+def test_model_dict_is_deprecated_alias_of_to_model_dict(context_model):
+    model_dict = context_model.to_model_dict()
+    assert model_dict[('want', 'to')] > 0
+    with pytest.deprecated_call():
+        assert context_model.model_dict == model_dict
+
+
+def test_pickle_round_trip(context_model):
+    unpickled = pickle.loads(pickle.dumps(context_model, protocol=4))
+    assert unpickled.vocab == context_model.vocab
+    assert unpickled.pair_probs.dtype == context_model.pair_probs.dtype
+    assert unpickled.to_model_dict() == context_model.to_model_dict()
+
+
+def test_unpickle_model_dict_of_older_models(context_model):
+    # models saved on spello<=1.3.0 keep float64 probabilities and counts of pairs keyed by pair of tokens
+    model_dict = {pair: float(prob) for pair, prob in context_model.to_model_dict().items()}
+    model = ContextModel.__new__(ContextModel)
+    model.__setstate__({'default_prob': context_model.default_prob, 'vocab': dict(context_model.vocab),
+                        'model_dict': model_dict, 'model_dict_count': dict.fromkeys(model_dict, 1)})
+    assert not hasattr(model, 'model_dict_count')
+    assert model.to_model_dict() == context_model.to_model_dict()
+    assert model.get_most_probable_sentence([['play'], ['ticket', 'cricket'], ['with'], ['be', 'me']]) == \
+        'play cricket with me'
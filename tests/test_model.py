@@ -0,0 +1,30 @@
+import os
+
+from spello.config import Config
+from spello.context.context import ContextModel
+from spello.model import SpellCorrectionModel
+from spello.phoneme.phoneme import PhonemeModel
+from spello.symspell.symspell import SymSpell
+
+# model trained and saved with spello 1.3.0, before symspell dictionary was split and models were packed on pickling
+BASELINE_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'model_1.3.0.pkl')
+
+
+def test_load_baseline_model(tmp_path):
+    model = SpellCorrectionModel(language='en').load(BASELINE_MODEL_PATH)
+    assert isinstance(model.config, Config)
+    assert isinstance(model.symspell_model, SymSpell)
+    assert isinstance(model.phoneme_model, PhonemeModel)
+    assert isinstance(model.context_model, ContextModel)
+    assert model.symspell_model.config is model.config
+    assert model.phoneme_model.config is model.config
+    assert model.symspell_model.counts['cricket'] == 4
+    assert model.spell_correct('i wnt to plai crikcet')['spell_corrected_text'] == 'i want to play cricket'
+    assert model.spell_correct('pleese bok a tabel for dinnr')['correction_dict'] == \
+        {'pleese': 'please', 'bok': 'book', 'tabel': 'table', 'dinnr': 'dinner'}
+
+    # saving a loaded model again writes the current layout
+    resaved = SpellCorrectionModel(language='en').load(model.save(str(tmp_path)))
+    assert resaved.symspell_model.counts == model.symspell_model.counts
+    assert resaved.context_model.to_model_dict() == model.context_model.to_model_dict()
+    assert resaved.spell_correct('i wnt to plai crikcet')['spell_corrected_text'] == 'i want to play cricket'
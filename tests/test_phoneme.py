@@ -0,0 +1,52 @@
+import pickle
+
+import pytest
+
+from spello.config import Config
+from spello.phoneme.phoneme import PackedPhonemeDict, PhonemeModel
+
+# codes given by the letter by letter soundex implementation of spello 1.3.0
+LATIN_SOUNDEX_CODES = [
+    ('availability', 'A181870000'),
+    ('Football', 'F718000000'),
+    ('a', 'A000000000'),
+    # runs of duplicate codes collapse to one, also when the run spans letters having the same code
+    ('bbbb', 'B100000000'),
+    ('ashcraft', 'A631027000'),
+    ('pfister', 'P267100000'),
+    ('tymczak', 'T936500000'),
+    # vowels and 'H', 'W', 'Y' separate duplicate codes before they are removed
+    ('mississippi', 'M661000000'),
+    ('hello', 'H800000000'),
+    # first letter is kept as is and is not collapsed with the code of the letters after it
+    ('ttt', 'T700000000'),
+    ('lloyd', 'L870000000'),
+    ('knight', 'K947000000'),
+    # code of 'R' is two digits and is never collapsed
+    ('robert', 'R110700000'),
+    ('rupert', 'R110700000'),
+    ('rr', 'R100000000'),
+    ('cricket', 'C103570000'),
+]
+PHONEME_DICT = {'P900000000': {'plan', 'plain'}, 'B8000000000': {'bail', 'ball', 'bell'}, 'A000000000': {'a'}}
+
+
+@pytest.mark.parametrize('token, soundex', LATIN_SOUNDEX_CODES)
+def test_get_latin_soundex(token, soundex):
+    assert PhonemeModel.get_latin_soundex(token) == soundex
+
+
+def test_packed_phoneme_dict_round_trip():
+    packed = PackedPhonemeDict(PHONEME_DICT)
+    unpickled = pickle.loads(pickle.dumps(packed, protocol=4))
+    assert isinstance(unpickled, PackedPhonemeDict)
+    assert {soundex: set(words) for soundex, words in unpickled.items()} == PHONEME_DICT
+    assert 'P100000000' not in unpickled
+
+
+def test_phoneme_model_is_pickled_packed():
+    model = PhonemeModel(Config(), 'en', phoneme_dict={soundex: set(words) for soundex, words in PHONEME_DICT.items()})
+    unpickled = pickle.loads(pickle.dumps(model, protocol=4))
+    assert isinstance(unpickled.phoneme_dict, PackedPhonemeDict)
+    assert {soundex: set(words) for soundex, words in unpickled.phoneme_dict.items()} == PHONEME_DICT
+    assert unpickled.script == 'en'
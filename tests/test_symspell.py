@@ -0,0 +1,79 @@
+import pickle
+
+import pytest
+
+from spello.config import Config
+from spello.symspell.symspell import marisa_trie, PackedDeleteMap, SymSpell
+
+WORDS = ['thagt', 'tuogh', 'thsi', 'that', 'thrugh', 'xyz']
+WORDS_COUNTER = {'that': 10, 'thought': 5, 'though': 3, 'this': 7, 'thus': 2, 'through': 4, 'tough': 2, 'thaw': 1}
+
+
+def get_symspell(verbosity):
+    config = Config()
+    config.symspell_verbosity = verbosity
+    symspell = SymSpell(config)
+    symspell.create_dictionary_from_words(WORDS_COUNTER)
+    return symspell
+
+
+def test_suggestions_keep_only_smallest_distance():
+    # 'thought' is reached through a delete before 'that' is found at distance 1, it must not survive the trim
+    assert get_symspell(verbosity=1).get_suggestions('thagt', silent=True) == [('that', (10, 1))]
+
+
+def test_suggestions_keep_all_distances_when_verbose():
+    suggestions = get_symspell(verbosity=2).get_suggestions('thagt', silent=True)
+    assert suggestions[0] == ('that', (10, 1))
+    assert ('thought', (5, 3)) in suggestions
+
+
+def test_spell_correct_extra_edit_rules_see_trimmed_suggestions():
+    spell_suggestions = get_symspell(verbosity=1).spell_correct('thagt')
+    assert not spell_suggestions.is_correct
+    assert spell_suggestions.suggestions == [('that', 1)]
+
+
+def test_unpacked_delete_map_gives_same_suggestions():
+    symspell = get_symspell(verbosity=2)
+    suggestions = [symspell.get_suggestions(word, silent=True) for word in WORDS]
+    symspell.pack_delete_map()
+    assert [symspell.get_suggestions(word, silent=True) for word in WORDS] == suggestions
+    symspell.unpack_delete_map()
+    assert isinstance(symspell.delete_map, dict)
+    assert [symspell.get_suggestions(word, silent=True) for word in WORDS] == suggestions
+
+
+def get_delete_map(symspell):
+    return {item: list(words) for item, words in symspell.delete_map.items()}
+
+
+@pytest.mark.parametrize('use_trie', [False, True])
+def test_pickle_round_trip(use_trie):
+    if use_trie and marisa_trie is None:
+        pytest.skip('marisa-trie is not installed')
+    symspell = get_symspell(verbosity=2)
+    delete_map = get_delete_map(symspell)
+    suggestions = [symspell.get_suggestions(word, silent=True) for word in WORDS]
+    if use_trie:
+        symspell.pack_delete_map(use_trie=True)
+    unpickled = pickle.loads(pickle.dumps(symspell, protocol=4))
+    assert isinstance(unpickled.delete_map, PackedDeleteMap)
+    assert unpickled.counts == WORDS_COUNTER
+    assert get_delete_map(unpickled) == delete_map
+    assert [unpickled.get_suggestions(word, silent=True) for word in WORDS] == suggestions
+
+
+def test_unpickle_combined_dictionary_of_older_models():
+    # models saved on spello<=1.3.0 keep counts and suggestions of words and deletes in a single `dictionary`
+    symspell = get_symspell(verbosity=2)
+    state = {name: value for name, value in symspell.__dict__.items() if name not in ('counts', 'delete_map')}
+    state['dictionary'] = symspell.dictionary
+    unpickled = SymSpell.__new__(SymSpell)
+    unpickled.__setstate__(state)
+    assert 'dictionary' not in vars(unpickled)
+    assert unpickled.counts == WORDS_COUNTER
+    assert get_delete_map(unpickled) == get_delete_map(symspell)
+    assert [unpickled.get_suggestions(word, silent=True) for word in WORDS] == \
+        [symspell.get_suggestions(word, silent=True) for word in WORDS]
+    assert unpickled.spell_correct('that').is_correct
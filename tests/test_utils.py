@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from spello import utils
+from spello.utils import dameraulevenshtein, get_edit_distances, get_word_distance
+
+
+def reference_distance(seq1, seq2):
+    # full matrix restricted Damerau-Levenshtein (optimal string alignment) distance
+    rows = [[0] * (len(seq2) + 1) for _ in range(len(seq1) + 1)]
+    for x in range(len(seq1) + 1):
+        rows[x][0] = x
+    for y in range(len(seq2) + 1):
+        rows[0][y] = y
+    for x in range(1, len(seq1) + 1):
+        for y in range(1, len(seq2) + 1):
+            cost = int(seq1[x - 1] != seq2[y - 1])
+            rows[x][y] = min(rows[x - 1][y] + 1, rows[x][y - 1] + 1, rows[x - 1][y - 1] + cost)
+            if x > 1 and y > 1 and seq1[x - 1] == seq2[y - 2] and seq1[x - 2] == seq2[y - 1]:
+                rows[x][y] = min(rows[x][y], rows[x - 2][y - 2] + 1)
+    return rows[-1][-1]
+
+
+def random_word(rng, length, alphabet='abcdé€'):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def get_word_pairs():
+    rng = random.Random(0)
+    pairs = [('', ''), ('', 'abc'), ('abc', ''), ('ba', 'abc'), ('fee', 'deed'), ('ca', 'abc'), ('abcd', 'acbd')]
+    for _ in range(300):
+        pairs.append((random_word(rng, rng.randint(0, 10)), random_word(rng, rng.randint(0, 10))))
+    # words around the 64 character limit of the bit-parallel kernel
+    for length_1, length_2 in [(63, 64), (64, 64), (64, 65), (65, 64), (65, 66), (1, 64), (64, 1), (70, 72)]:
+        for _ in range(5):
+            word = random_word(rng, length_1)
+            other = list(word[:length_2]) + list(random_word(rng, max(0, length_2 - length_1)))
+            for _ in range(rng.randint(0, 4)):
+                other[rng.randrange(len(other))] = rng.choice('abcdé€')
+            pairs.append((word, ''.join(other)))
+            pairs.append((word, random_word(rng, length_2)))
+    return pairs
+
+
+WORD_PAIRS = get_word_pairs()
+MAX_DISTANCES = [None, 0, 1, 2, 3]
+
+
+def check_distances(distance):
+    for word_1, word_2 in WORD_PAIRS:
+        expected = reference_distance(word_1, word_2)
+        for max_distance in MAX_DISTANCES:
+            if max_distance is None:
+                assert distance(word_1, word_2, None) == expected, (word_1, word_2)
+            else:
+                assert distance(word_1, word_2, max_distance) == min(expected, max_distance + 1), \
+                    (word_1, word_2, max_distance)
+
+
+def test_dameraulevenshtein():
+    check_distances(dameraulevenshtein)
+
+
+def test_dameraulevenshtein_pure_python(monkeypatch):
+    monkeypatch.setattr(utils, 'OSA', None)
+    monkeypatch.setattr(utils, '_dameraulevenshtein_codes', None)
+    check_distances(dameraulevenshtein)
+    assert dameraulevenshtein('abcd', ['b', 'a', 'c', 'd', 'e']) == 2
+
+
+def test_dameraulevenshtein_numba_kernels():
+    if utils._dameraulevenshtein_codes is None:
+        pytest.skip('numba is not installed')
+
+    def distance(word_1, word_2, max_distance):
+        if max_distance is None:
+            max_distance = max(len(word_1), len(word_2))
+        return int(utils._dameraulevenshtein_codes(utils._get_char_codes(word_1), utils._get_char_codes(word_2),
+                                                   max_distance))
+
+    check_distances(distance)
+
+
+@pytest.mark.parametrize('rapidfuzz', [True, False])
+def test_get_edit_distances(monkeypatch, rapidfuzz):
+    if not rapidfuzz:
+        monkeypatch.setattr(utils, 'OSA', None)
+        monkeypatch.setattr(utils, 'cdist', None)
+    for word in ['kricket', 'a' * 64, 'é' * 65]:
+        candidates = [word_2 for _, word_2 in WORD_PAIRS[:100]] + [word[:-1], word + 'b', word[::-1]]
+        for max_distance in MAX_DISTANCES:
+            expected = [reference_distance(word, candidate) for candidate in candidates]
+            if max_distance is not None:
+                expected = [min(distance, max_distance + 1) for distance in expected]
+            assert get_edit_distances(word, candidates, max_distance) == expected
+            word_distance = get_word_distance(word)
+            assert [word_distance(candidate, max_distance) for candidate in candidates] == expected